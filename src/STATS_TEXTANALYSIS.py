@@ -10,11 +10,49 @@ version = __version__
 # 01-10-2023 support encodings for supp files
 # 08-21-2024 add punkt_tab to the required packages list
 # 09-24-2024 move punkt_tab to data module list so existing installations will pick it up
+# 10-18-2026 score sentiment in blocks of cases without SPSSINC TRANS
+# 10-18-2026 add FREQUENCIES PROCESSES for counting in a process pool
+# 10-18-2026 add FREQUENCIES METHOD and MAXITEMS for bounded-memory approximate counts
+# 10-18-2026 run all the per-case tasks in a single data pass
+# 10-18-2026 add SPELLING CACHESIZE for a persistent correction cache
+# 10-18-2026 add SPELLING ENGINE with a symmetric delete index option
+# 10-18-2026 match n-gram search terms one synonym set per position
+# 10-18-2026 add SEARCH INDEX to answer searches from saved inverted indexes
+# 10-18-2026 add OPTIONS subcommand with bounded cache budgets and statistics
+# 10-18-2026 add ENTITYSEARCH PROCESSES and batch the tagging and chunking
+# 10-18-2026 add ENTITYSEARCH PREFILTER and memoize entities
+# 10-18-2026 compute spelling, search, and stems once per distinct text
+# 10-18-2026 add OPTIONS SAVESTEMS to keep the stem table between sessions
+# 10-18-2026 load resources on first use and add OPTIONS LOADTIMES
+# 10-18-2026 verify nltk data against a manifest and download only with OPTIONS DOWNLOAD
+# 10-18-2026 add OPTIONS TIMING for a table of the time of each task and variable
+# 10-18-2026 add TOKENIZER to choose a regular expression tokenizer
+# 10-18-2026 expand SEARCH synonyms from a saved WordNet synonym index
+# 10-18-2026 SPSSINC TRANS is no longer required, and task parameters are not kept in globals
+# 10-18-2026 write the new variables as each case is computed
+# 10-18-2026 start the ENTITYSEARCH process pool in the data pass
+# 10-18-2026 ENTITYSEARCH PREFILTER defaults to NO
+# 10-18-2026 check only the nltk data packages that the nltk version and the run need
+# 10-18-2026 ENTITYSEARCH tags and chunks a block at a time with or without a process pool
 
 import spss, spssaux
 from extension import Template, Syntax, processcmd
-import sys, re, os, locale
+import sys, re, os, locale, time
 from itertools import product
+import synindex
+
+# Resources are loaded by the first task that needs them, and the time taken for each is recorded
+importstart = time.perf_counter()
+loadtimes = {}    # seconds to load each resource, in load order
+loadcommands = {}    # the command number that loaded each resource
+commandcount = 0
+
+def recordload(name, start):
+    """Record the time since start as the load time of resource name unless it is already recorded"""
+    
+    if name not in loadtimes:
+        loadtimes[name] = time.perf_counter() - start
+        loadcommands[name] = commandcount
 
 # debugging
         # makes debug apply only to the current thread
@@ -46,36 +84,40 @@ def fixMacCert():
     cert_path = certifi.where()
     os.environ["SSL_CERT_FILE"] = cert_path
     os.environ["REQUESTS_CA_BUNDLE"] = cert_path
+
+# the nltk data resources verified in this session
+verified = set()
+
+def checkdata(features, download=False):
+    """Make sure that the nltk data resources needed for features are installed
+    
+    features is a list of keys of textresources.FEATURES.
+    Missing resources are downloaded only if download is True, since that
+    requires the network.  Otherwise an exception lists them"""
     
-fixMacCert()
-
-def installData(downloader, dddir):
-    """Install required nltk data files if not already present"""
-    
-    # data files go wherever nltk wants them
-    ###print(dddir)
-    ###dddir = nltk.downloader.Downloader().default_download_dir()
-    toget = []
-    for n in ['corpora/names','corpora/stopwords','corpora/wordnet','sentiment/vader_lexicon',
-              "tokenizers/punkt", "taggers/averaged_perceptron_tagger", "taggers/averaged_perceptron_tagger_ru",
-              "chunkers/maxent_ne_chunker", "corpora/words", "corpora/omw", "corpora/omw-1.4", "tokenizers/punkt_tab"]:
-        if not os.path.exists(dddir + os.sep + n + ".zip"):
-            dname = os.path.basename(n)
-            toget.append(dname)
-    if toget:
-        # Can't use _ translation function here, because this is running at import time
-        # not via the Run function
-        print(f"""Downloading nltk data files: {toget} to {dddir}""")
-        ###nltk.download(toget, quiet=True)    
-        downloader.download(toget, quiet=True)
-        # nltk 3.8.2+ requires the punkt_tab module as punkt has been deprecated
-        # due to a pickle security problem.  
+    import texta, textresources
+    needed = [name for name in textresources.required(features) if name not in verified]
+    if not needed:
+        return
+    start = time.perf_counter()
+    manifest = textresources.Manifest(os.path.join(texta.cachedir(), textresources.MANIFEST_NAME))
+    missing = manifest.verify(needed)
+    if missing and download:
+        fixMacCert()
+        textresources.download(missing)
+        missing = manifest.verify(missing)
+    manifest.save()
+    verified.update(name for name in needed if name not in missing)
+    recordload("nltk data check", start)
+    if missing:
+        raise ValueError(_("""These nltk data resources are not installed: {0}.
+Specify DOWNLOAD=YES on the OPTIONS subcommand to download them, or install them with nltk.download""").format(
+            ", ".join(missing)))
 
 try:
-    from nltk import downloader
-    dlpath = downloader.Downloader().default_download_dir()
-    installData(downloader, dlpath)
+    start = time.perf_counter()
     import nltk
+    recordload("nltk", start)
 except:
     print("""The nltk module is required in order to use this module.
 See the dialog or syntax help for the procedure.""")
@@ -160,28 +202,29 @@ stopwordslangg = ""
 stemmerlangg = ""
 stemmergg = None
 searchstemg = False
-haswordslistparams = {}
-spellcorrectionparams = {}
-sentimentparams = {}
-hasentitylistparams = {}
 sentlanguage = "english"
 langabbrev = {'english':"en", "spanish":"es", "german":"de", "french":"fr", "portuguese": "pt"}
 
 # main routine
-def dotext(varnames=None, overwrite=False, stopwordslang="english", stemmerlang="english",
-        dospelling=False, ignorenames=True, extradict=None, spsuffix="cor", language="english",
-        dofreq=False, stem=False, freqcount=10, 
+def dotext(varnames=None, overwrite=False, stopwordslang="english", stemmerlang="english", tokenizer="nltk",
+        dospelling=False, ignorenames=True, extradict=None, spsuffix="cor", language="english", spcachesize=500000,
+        spengine="pyspellchecker",
+        dofreq=False, stem=False, freqcount=10, freqprocesses=1, freqmethod="exact", freqmaxitems=10000,
         doscores=False, scoresfile=None,
         dosent=False, stypes=None, ssuffixes=None, sentlang="english", 
         dosearch=False, searchwords=None, smode="anywords", swsuffix="ser", searchstem=False, 
-            posp=None, displaysyn=False, searchlang="eng",
-        doesearch=False, etype="alltypes", outsize=100, esuffix="eser",
+            posp=None, displaysyn=False, searchlang="eng", searchindex=False,
+        doesearch=False, etype="alltypes", outsize=100, esuffix="eser", eprocesses=1,
+        eprefilter=False,
         dolexicon=False, lexdsname=None,
         doterms=False, negationfile=None, negationdsname=None, emphasisfile=None, emphasisdsname=None,
         suppencoding="locale", 
-        dostems=False, stemssuffix="stem"):
+        dostems=False, stemssuffix="stem",
+        cachestats=False, cachemb=None, savestems=True, loadtimesreport=False, download=False, timing=False):
     
     global allnewnames, extraspelldict, laststopwordslang, sstopwords, stopwordslangg, stemmerlangg, stemmergg, sentlanguage
+    global commandcount
+    commandcount += 1
     sentlanguage= sentlang
     allnewnames = []
     #from nltk import downloader
@@ -189,14 +232,36 @@ def dotext(varnames=None, overwrite=False, stopwordslang="english", stemmerlang=
 
     #installData(downloader, dldir)
     #import nltk
-    from nltk import SnowballStemmer
-    import texta
+    start = time.perf_counter()
+    import texta, textcache
+    recordload("texta", start)
     
-    checkdep("SPSSINC_TRANS")
     # make sure required data files are installed
 
     if not any([dospelling, dofreq, dosent, dosearch, doesearch, dolexicon, doscores, dostems, doterms]):
         raise ValueError(_("No actions were specified for the command"))
+    features = []
+    if any([dofreq, dosearch, doesearch, dostems]) and tokenizer == "nltk":
+        features.append("tokenize")
+    if varnames is not None and stopwordslang != "none":
+        features.append("stopwords")
+    if dospelling and ignorenames:
+        features.append("names")
+    if dosearch:
+        features.append("wordnet")
+        if searchlang.lower() != "eng":
+            features.append("omw")
+    if sentlang == "english" and any([dosent, dolexicon, doscores, doterms]):
+        features.append("sentiment")
+    if doesearch:
+        features.append("entities")
+    checkdata(features, download)
+    # the caches persist across commands, but the statistics are for this one
+    textcache.resetstats()
+    textcache.setbudgets(cachemb and cachemb * textcache.MB)
+    texta.settokenizer(tokenizer)
+    # the time of each task is recorded only if the table is requested
+    timings = texta.Timings(timing)
     
     language = langabbrev[language.lower()]
     # varnames must not be None if spellcheck, sentiment, or search is used
@@ -212,7 +277,9 @@ def dotext(varnames=None, overwrite=False, stopwordslang="english", stemmerlang=
         # nameset will be updated as new variables are created
         if stopwordslang != laststopwordslang:
             if stopwordslang != "none":
+                start = time.perf_counter()
                 sstopwords = frozenset(nltk.corpus.stopwords.words(stopwordslang))
+                recordload("stopwords " + stopwordslang, start)
             else:
                 sstopwords = frozenset(["none"])
             laststopwordslang = stopwordslang        
@@ -224,33 +291,71 @@ def dotext(varnames=None, overwrite=False, stopwordslang="english", stemmerlang=
         suppencoding = locale.getpreferredencoding()
     else:
         suppencoding = "utf-8-sig"
-    stemmergg = SnowballStemmer(stemmerlang).stem
+    # the stem table is shared by all the tasks that stem
+    savestems = savestems and ((dofreq and stem) or (dosearch and searchstem) or dostems)
+    stemmergg = texta.cachedstemmer(stemmerlang, load=savestems)
     stemmerlangg = stemmerlang
     ###searchstemg = searchstem
 
+    # The per-case tasks are collected into a plan and computed together in one data pass.
+    # Scores and special terms change the sentiment lexicon, so they are loaded first.
+    tasks = []
     #spell checking
     if dospelling:
-        spelling(spsuffix, varnames, nameset, ignorenames, overwrite, extradict, vardict, language)
+        with timings.measure("SPELLING", _("Setup")):
+            tasks.append(spelling(spsuffix, varnames, nameset, ignorenames, overwrite, extradict, vardict, language,
+                spcachesize, spengine))
         
     if doscores:
         if scoresfile is None:
             raise ValueError(_("A scores file load was required, but no file name was specified"))
-        texta.addSentimentScores(scoresfile, suppencoding)
+        with timings.measure("WORDSCORES"):
+            texta.addSentimentScores(scoresfile, suppencoding)
         
     if doterms:
-        texta.terms(negationfile, negationdsname, emphasisfile, emphasisdsname, suppencoding)
+        with timings.measure("SPECIALTERMS"):
+            texta.terms(negationfile, negationdsname, emphasisfile, emphasisdsname, suppencoding)
     
+    freqtask = None
     if dofreq:
-        texta.freqslist(varnames, stem=stem, stemcode=stemmergg, stemmerlang=stemmerlang, count=freqcount)
+        if freqmethod == "approximate":
+            if freqmaxitems < freqcount:
+                raise ValueError(_("MAXITEMS must be at least as large as COUNT"))
+        else:
+            freqmaxitems = None
+        weightvar = spss.GetWeightVar()
+        if freqprocesses > 1:
+            # the worker processes do their own tokenizing, so this is a separate pass
+            with timings.measure("FREQUENCIES", _("All variables")):
+                texta.freqslist(varnames, stem=stem, stemcode=stemmergg, stemmerlang=stemmerlang, count=freqcount,
+                    processes=freqprocesses, maxitems=freqmaxitems)
+        else:
+            freqtask = texta.freqstask(varnames, weightvar, stem and stemmergg or None, freqmaxitems)
+            tasks.append(freqtask)
         
     if dosent:
-        sentiment(stypes, ssuffixes, nameset, varnames, overwrite, sentlanguage)
+        with timings.measure("SENTIMENT", _("Setup")):
+            tasks.append(sentiment(stypes, ssuffixes, nameset, varnames, overwrite, sentlanguage))
     
     if dosearch:
-        searching(searchwords, smode, nameset, swsuffix, varnames, overwrite, searchstem, posp, displaysyn, searchlang)
+        with timings.measure("SEARCH", _("Setup")):
+            tasks.append(searching(searchwords, smode, nameset, swsuffix, varnames, overwrite, searchstem, posp,
+                displaysyn, searchlang, searchindex))
         
     if doesearch:
-        esearching(etype, esuffix, varnames, nameset, overwrite, outsize)
+        with timings.measure("ENTITYSEARCH", _("Setup")):
+            tasks.append(esearching(etype, esuffix, varnames, nameset, overwrite, outsize, eprocesses, eprefilter))
+        
+    if dostems:
+        tasks.append(stemming(varnames, nameset, overwrite, stemssuffix, vardict))
+    
+    if tasks:
+        texta.runplan(varnames, tasks, freqtask is not None and weightvar or None, timings)
+    if freqtask is not None:
+        labels = spssaux.VariableDict(varnames)
+        for v, (fd, bfd, tfd, hastextcount) in zip(varnames, freqtask.counts):
+            texta.freqtables(v, labels[v].VariableLabel, weightvar, stem, stemmerlang, freqcount, freqmaxitems,
+                fd, bfd, tfd, hastextcount)
         
     activeds = spss.ActiveDataset()
     if dolexicon:
@@ -258,17 +363,23 @@ def dotext(varnames=None, overwrite=False, stopwordslang="english", stemmerlang=
             raise ValueError(_("The active dataset must have a name to create a lexicon."))
         if lexdsname is None:
             raise ValueError(_("No dataset name was specified for the lexicon dataset"))
-        texta.createLexiconDataset(lexdsname)
+        with timings.measure("LEXICON"):
+            texta.createLexiconDataset(lexdsname)
         spss.Submit("dataset activate {0}".format(activeds))
         
-    if dostems:
-        stemming(varnames, nameset, overwrite, stemssuffix, vardict)
+    if savestems:
+        texta.savestems()
+    if cachestats:
+        texta.cachereport()
+    if loadtimesreport:
+        loadreport()
     # report variable creation or modification
-    report(allnewnames)
+    report(allnewnames, timings)
 
 def sentiment(stypes, ssuffixes, nameset, varnames, overwrite, german):
+    """Return the sentiment scores task"""
     
-    global sentimentparams
+    import texta
     
     ssdict = {"neg": "neg", "neu":"neu", "pos":"pos", "comp":"comp"}
     if stypes is None:
@@ -278,28 +389,52 @@ def sentiment(stypes, ssuffixes, nameset, varnames, overwrite, german):
     if len(stypes) != len(ssuffixes):
         raise ValueError("Number of sentiment suffixes is different from Number of sentiment types.")
     sdict = dict(zip(stypes, ssuffixes))
-    outnames = " ".join(newnames(varnames, ssuffixes, nameset, overwrite))
-    varnamesargs = ", ".join(varnames)
-    stypesargs = " ".join(stypes)
-    sentimentparams['types'] = stypesargs
-    cmd = """spssinc trans result={outnames} type=0
-        /formula texta.sentscoreslist({varnamesargs}).""".format(**locals())
-    spss.Submit(cmd)
+    outnames = newnames(varnames, ssuffixes, nameset, overwrite)
+    # keys follow the order of TYPES so that they line up with the suffixes
+    keys = [texta.sentkeys([item])[0] for item in stypes]
+    # the cases are scored a block at a time
+    return texta.Task(outnames, len(outnames) * [0],
+        lambda columns, weights: texta.sentscoresbatch([[case.text for case in col] for col in columns], keys),
+        name="SENTIMENT")
+
+# this is a lazy loader, so wordnet is read when first used.  checkdata makes sure that it is installed
+from nltk.corpus import wordnet as wn
+
+def wordnetlangs():
+    """Return the WordNet languages, loading WordNet if it is not already loaded"""
+    
+    start = time.perf_counter()
+    result = wn.langs()    # the first use loads wordnet
+    recordload("wordnet", start)
+    return result
 
-try:
-    from nltk.corpus import wordnet as wn
-except:
-    print("installing wordnet")
-    nltk.download("wordnet")
+def synonyms(word, pos, lang):
+    """Return the synonyms of word for the parts of speech pos in language lang
+    
+    They come from the saved synonym index if word is in it and otherwise from WordNet"""
+    
+    import texta
+    poskey = pos[0] if len(pos) == 1 else synindex.ALLPOS
+    index = texta.synonymindex(lang)
+    if index is not None:
+        result = index.synonyms(word, poskey)
+        if result is not None:
+            return result
+    wordnetlangs()
+    return synindex.lemmasynonyms(wn, word, poskey, lang)
+    
+def searching(searchwords, smode, nameset, swsuffix, varnames, overwrite, searchstem, posp, displaysyn, searchlang,
+        searchindex=False):
+    """Return the word search task"""
     
-def searching(searchwords, smode, nameset, swsuffix, varnames, overwrite, searchstem, posp, displaysyn, searchlang):
-    global haswordslistparams
+    import texta
     if searchwords is None:
         raise ValueError(_("A word search was specified, but no word list was given"))
     searchlang = searchlang.lower()
-    if not searchlang in wn.langs():
+    # the listed languages do not need wordnet to be loaded, since synonyms come from the synonym index
+    if searchlang not in langsd and searchlang not in wordnetlangs():
         raise ValueError(f"Unsupported search language was specified: {searchlang}")
-    outnames = " ".join(newnames(varnames, [swsuffix], nameset, overwrite))
+    outnames = newnames(varnames, [swsuffix], nameset, overwrite)
     ###varnamesargs = ", ".join(varnames)
     customa = "criteria: " + " ".join(searchwords).replace(" - ", "-")
     searchitems = makesearch(searchwords, posp, searchlang)    # sideffects!
@@ -307,16 +442,25 @@ def searching(searchwords, smode, nameset, swsuffix, varnames, overwrite, search
         numwords = len(searchitems)
     else:
         numwords = 0
-    varnames = " ".join(varnames)
-    cmd = f"""spssinc trans result={outnames} type={numwords}
-    /variables {varnames}
-    /formula texta.haswordslist(<>)."""
-    haswordslistparams["words"] = searchitems
-    haswordslistparams["mode"] = smode
-    haswordslistparams["searchstem"] = searchstem
-    spss.Submit(cmd)
-    spss.Submit("""VARIABLE ATTRIBUTE VARIABLES={0} ATTRIBUTE=search("{1}").
-    MISSING VALUES {0} ("").""".format(outnames, customa))
+    # the terms are identified by their acceptable words in each position
+    params = ("search", tuple(item.slots for item in searchitems), smode, searchstem, searchstem and stemmerlangg,
+        texta.tokenizer)
+    
+    def search(case):
+        return texta.haswords(case.text, searchitems, smode, searchstem, case.lowertokens)
+    
+    def compute(columns, weights):
+        result = []
+        for values in texta.memocolumns(columns, "text search", params, search):
+            if numwords == 0:
+                # numeric result: blank text is sysmis
+                values = [None if value == "" else int(value) for value in values]
+            result.append(values)
+        return result
+    
+    syntax = """VARIABLE ATTRIBUTE VARIABLES={0} ATTRIBUTE=search("{1}").""".format(" ".join(outnames), customa)
+    if numwords > 0:
+        syntax += """\nMISSING VALUES {0} ("").""".format(" ".join(outnames))
     if displaysyn:
         rowlabels = []
         synonyms = []
@@ -338,6 +482,11 @@ def searching(searchwords, smode, nameset, swsuffix, varnames, overwrite, search
             collabels=["Word, Bigram, and Trigram Synonyms"],
             cells=synonyms)
         spss.EndProcedure()   
+    if searchindex:
+        task = texta.indexedsearchtask(varnames, outnames, numwords, searchitems, smode, searchstem, stemmerlangg)
+        task.syntax = syntax
+        return task
+    return texta.Task(outnames, len(outnames) * [numwords], compute, syntax, name="SEARCH")
 
     # Any part of speech must come from this set  ('y' is converted to all parts).
     # There should be one character per segment of item, e.g., 2 for a bigram.
@@ -371,16 +520,9 @@ class Word():
         if pos == "x":    # no synonyms
             self.words = set([word])
         else:
-            if len(pos) == 1:                
-                self.syns = wn.synsets(word, pos=pos[0], lang=lang)
-            else:
-                self.syns = wn.synsets(word, lang=lang)
-            names = []
-            if self.syns:  # there might not be any qualifying synonyms
-                for syn in self.syns:
-                    for item in syn.lemma_names(lang=lang):
-                        names.append(item.replace("_", "-"))
+            names = synonyms(word, pos, lang)    # there might not be any qualifying synonyms
             self.words = set(names + [word])
+        self.slots = (frozenset(self.words),)
         
     # argument must be a sequence
     def isin(self, textlist):
@@ -401,23 +543,26 @@ class Bigram():
             if pos[i] == "x":
                 names[i].append(text[i])   # no synonyms
             else:
-                if len(pos[i]) == 1:                
-                    self.syns = wn.synsets(text[i], pos=pos[i][0], lang=lang)
-                else:
-                    self.syns = wn.synsets(text[i], lang=lang)                
-                for syn in self.syns:
-                    for item in syn.lemma_names(lang=lang):
-                        names[i].append(item.replace("_", "-"))   #???
-        self.words = list(product(set(names[0] + [text[0]]), set(names[1] + [text[1]])))
+                names[i].extend(synonyms(text[i], pos[i], lang))
+        # one set of acceptable words for each position.  An n-gram matches if each
+        # of its words is in the set for its position, so the combinations are never listed
+        self.slots = (frozenset(names[0] + [text[0]]), frozenset(names[1] + [text[1]]))
+        
+    @property
+    def words(self):
+        """list of all the word combinations for display"""
+        return list(product(*self.slots))
         
     def isin(self, textlist):
-        return any(item in self.words for item in textlist)
+        first, second = self.slots
+        return any(w1 in first and w2 in second for w1, w2 in textlist)
     
 class Trigram():
     length = 3
     
     def __init__(self, trigram, posp, lang):
         ###self.text = trigram.split("-")
+        trigram = trigram.lower()
         self.rowlabel = trigram + "(" + posp + ")"
         self.trigram = tuple(w.lower() for w in trigram)  #?
         pos = validateposp(posp, 3)
@@ -428,17 +573,17 @@ class Trigram():
             if pos[i] == "x":
                 names[i].append(text[i])
             else:
-                if len(pos[i]) == 1:                
-                    self.syns = wn.synsets(text[i], pos=pos[i][0], lang=lang)
-                else:
-                    self.syns = wn.synsets(text[i], lang=lang)                
-                for syn in self.syns:
-                    for item in syn.lemma_names(lang=lang):
-                        names[i].append(item.replace("_", "-"))
-            self.words = list(product(set(names[0] + [text[0]]), set(names[1] + [text[1]]), set(names[2] + [text[2]])))
+                names[i].extend(synonyms(text[i], pos[i], lang))
+        self.slots = tuple(frozenset(names[i] + [text[i]]) for i in range(3))
+        
+    @property
+    def words(self):
+        """list of all the word combinations for display"""
+        return list(product(*self.slots))
         
     def isin(self, textlist):
-        return any(item in self.words for item in textlist)
+        first, second, third = self.slots
+        return any(w1 in first and w2 in second and w3 in third for w1, w2, w3 in textlist)
 
 langs = [
     ('eng',	'english'),
@@ -540,61 +685,83 @@ def restructure(items, posp):
     return items, pos
     
                     
-def esearching(etype, esuffix, varnames, nameset, overwrite, outsize):
-    global hasentitylistparams
+def esearching(etype, esuffix, varnames, nameset, overwrite, outsize, processes=1, prefilter=False):
+    """Return the named entity search task
+
+    processes is the number of worker processes for tagging and chunking
+    prefilter specifies whether to skip text without capitalized words"""
+    
+    import texta
     #searchlang = searchlang.lower()
     #if not searchlang in wn.langs():
     #    raise ValueError(f"Unsupported search language was specified: {searchlang}")
     # types are not checked
     
-    outnames = " ".join(newnames(varnames, [esuffix], nameset, overwrite))
+    outnames = newnames(varnames, [esuffix], nameset, overwrite)
     ###varnamesargs = ", ".join(varnames)
-    varnames = " ".join(varnames)
-    cmd = f"""spssinc trans result={outnames} type={outsize}
-    /variables {varnames}
-    /formula "texta.hasneslist(<>)"."""
-    hasentitylistparams["etype"] = etype
-    if etype.lower() != "alltypes":
-        hasentitylistparams["regexp"] = re.compile("<" + etype.upper()[:3] + ">")
-    else:
-        hasentitylistparams["regexp"] = None
-    spss.Submit(cmd)
-    spss.Submit(f"""VARIABLE ATTRIBUTE VARIABLES={outnames} ATTRIBUTE=search("{etype}").
-    MISSING VALUES {outnames} ("").""")
+    regexp = texta.entitypattern(etype)
+    
+    # The pool is started by the first block in runplan, so that an error in setting up
+    # a later task cannot leave worker processes running.  runplan always closes it
+    usepool = processes > 1
+    pool = [None]
+    
+    def closepool():
+        if pool[0] is not None:
+            pool[0].terminate()
+            pool[0] = None
+    
+    counts = dict.fromkeys(["text", "prefiltered", "memo", "chunked"], 0)
+    
+    # each block is tagged and chunked with one call, divided among the pool processes if any
+    def compute(columns, weights):
+        if usepool and pool[0] is None:
+            pool[0] = texta.makepool(processes)
+        return texta.hasnesbatch(columns, etype, regexp, pool[0], processes, prefilter, counts)
+    
+    outnamesstr = " ".join(outnames)
+    # with a pool, all the variables are done together, so the pool has more texts to divide
+    return texta.Task(outnames, len(outnames) * [outsize], compute,
+        f"""VARIABLE ATTRIBUTE VARIABLES={outnamesstr} ATTRIBUTE=search("{etype}").
+    MISSING VALUES {outnamesstr} ("").""", finish=lambda: texta.entityreport(counts, prefilter),
+        close=closepool, name="ENTITYSEARCH", pervariable=not usepool)
 
 
-def spelling(spsuffix, varnames, nameset, ignorenames, overwrite, extradict, vardict, language):
-    """Do spelling check"""
-    global spellcorrectionparams
+def spelling(spsuffix, varnames, nameset, ignorenames, overwrite, extradict, vardict, language, cachesize, engine):
+    """Return the spelling correction task"""
+    import texta
     
-    outnames = " ".join(newnames(varnames, [spsuffix], nameset, overwrite))
-    varnamescomma = ", ".join(varnames)
+    outnames = newnames(varnames, [spsuffix], nameset, overwrite)
     ###outsizes = [item.VariableType +10 for item in vardict.Variables]
-    outsizes = " ".join([str(v.VariableType + 10) for v in vardict if v in varnames])
+    outsizes = [vardict[v].VariableType + 10 for v in varnames]
     if extradict is None:
         xtra = ""
     else:
         ###xtra = """, extradict='{extradict}'""".format(**locals())
         xtra = extradict
-    spellcorrectionparams['excludenames'] = ignorenames
-    spellcorrectionparams['extradict'] = xtra
-    spellcorrectionparams['language'] = language
-    spellcorrectionparams['stopwords'] = sstopwords
-    cmd = '''SPSSINC TRANS RESULT= {outnames} TYPE={outsizes}
-    /FORMULA 
-    texta.spellcorrection({varnamescomma}).'''.format(**locals())
-    spss.Submit(cmd)
+    stopwords = sstopwords
+    texta.spellsetup(language, xtra, cachesize, engine)
+    
+    params = ("spelling", texta.spellmemo.dictkey, ignorenames, laststopwordslang)
+    
+    def compute(columns, weights):
+        return texta.memocolumns(columns, "text spelling", params,
+            lambda case: texta.correcttext(case.text, ignorenames, stopwords))
+    
+    return texta.Task(outnames, outsizes, compute, finish=texta.spellreport, name="SPELLING")
     
 def stemming(varnames, nameset, overwrite, suffix, vardict):
-    """Produce stemmed variables"""
+    """Return the stemmed variables task"""
+    import texta
     
-    outnames = " ".join(newnames(varnames, [suffix], nameset, overwrite))
-    outsizes = " ".join([str(v.VariableType) for v in vardict if v in varnames])
-    varnamesargs = ",".join(varnames)
-
-    cmd = """spssinc trans result={outnames}  TYPE={outsizes}
-        /formula "texta.stems({varnamesargs})".""".format(**locals())
-    spss.Submit(cmd)    
+    outnames = newnames(varnames, [suffix], nameset, overwrite)
+    outsizes = [vardict[v].VariableType for v in varnames]
+    
+    def compute(columns, weights):
+        return texta.memocolumns(columns, "text stems", ("stems", stemmerlangg, texta.tokenizer),
+            lambda case: texta.stemtext(case.text, case.lowertokens))
+    
+    return texta.Task(outnames, outsizes, compute, name="STEMS")
     
         
 def newnames(varnames, suffixes, nameset, overwrite):
@@ -628,18 +795,37 @@ def newnames(varnames, suffixes, nameset, overwrite):
     allnewnames.extend(outnames)
     return outnames
 
-def report(newnames):
+def report(newnames, timings=None):
     """Display table of new or overwritten variables
     
-    newnames is the list of variables"""
+    newnames is the list of variables
+    timings is a texta.Timings object whose table is displayed with it or None"""
     
+    import texta
+    timed = timings is not None and timings.rows
     if len(newnames) == 0:
         print(_("No variables were created or modified by STATS TEXTANALYSIS"))
-        return
+        if not timed:
+            return
     
     spss.StartProcedure("Text Analysis")
-    pt = spss.BasePivotTable(_("New or Modified Variables"), "Newvars")
-    pt.SimplePivotTable(rowlabels=[str(i) for i in range(1, len(newnames) + 1)], collabels=[_("Variables")], cells=newnames)
+    if newnames:
+        pt = spss.BasePivotTable(_("New or Modified Variables"), "Newvars")
+        pt.SimplePivotTable(rowlabels=[str(i) for i in range(1, len(newnames) + 1)], collabels=[_("Variables")], cells=newnames)
+    if timed:
+        texta.timingreport(timings)
+    spss.EndProcedure()
+
+def loadreport():
+    """Display the time taken to load each resource loaded so far in the session"""
+    
+    spss.StartProcedure("Text Analysis")
+    spss.AddProcedureFootnotes(_("Resources are loaded once per session when first needed"))
+    spss.AddProcedureFootnotes(_("The STATS_TEXTANALYSIS time includes the nltk time"))
+    pt = spss.BasePivotTable(_("Load Times"), "LoadTimes")
+    pt.SimplePivotTable(rowlabels=list(loadtimes), collabels=[_("Seconds"), _("Loaded by This Command")],
+        cells=[[seconds, loadcommands[name] == commandcount and _("Yes") or _("No")]
+            for name, seconds in loadtimes.items()])
     spss.EndProcedure()
     
 #def installData(downloader, dddir):
@@ -678,6 +864,7 @@ def  Run(args):
             vallist=['arabic', 'danish', 'dutch', 'english', 'finnish', 'french', 
                 'german', 'hungarian', 'italian', 'norwegian', 'porter', 'portuguese', 
                 'romanian', 'russian', 'spanish', 'swedish']),
+        Template("TOKENIZER", subc="", ktype="str", var="tokenizer", vallist=["nltk", "regex"]),
         
         Template("DOSPELLING", subc="SPELLING", ktype="bool", var="dospelling"),
         Template("EXCLUDENAMES", subc="SPELLING", ktype="bool", var="ignorenames"),
@@ -685,10 +872,15 @@ def  Run(args):
         Template("SUFFIX", subc="SPELLING", ktype="varname", var="spsuffix", islist=False),
         Template("DICTLANGUAGE", subc="SPELLING", ktype="str", var="language",
             vallist=['english','spanish','german','french','portuguese']),
+        Template("CACHESIZE", subc="SPELLING", ktype="int", var="spcachesize", vallist=[0]),
+        Template("ENGINE", subc="SPELLING", ktype="str", var="spengine", vallist=["pyspellchecker", "symspell"]),
         
         Template("DOFREQ", subc="FREQUENCIES", ktype="bool", var="dofreq"),
         Template("STEM", subc="FREQUENCIES", ktype="bool", var="stem"),
         Template("COUNT", subc="FREQUENCIES", ktype="int", var="freqcount"), 
+        Template("PROCESSES", subc="FREQUENCIES", ktype="int", var="freqprocesses", vallist=[1, 256]),
+        Template("METHOD", subc="FREQUENCIES", ktype="str", var="freqmethod", vallist=["exact", "approximate"]),
+        Template("MAXITEMS", subc="FREQUENCIES", ktype="int", var="freqmaxitems", vallist=[1]),
 
         Template("DOSENT", subc="SENTIMENT", ktype="bool", var="dosent"),
         Template("TYPES", subc="SENTIMENT", ktype="str", var="stypes", islist=True,
@@ -710,11 +902,14 @@ def  Run(args):
         Template("SUFFIX", subc="SEARCH", ktype="varname", var="swsuffix"),
         Template("STEM", subc="SEARCH", ktype="bool", var="searchstem"),
         Template("DISPLAYSYN", subc="SEARCH", ktype="bool", var="displaysyn"),
+        Template("INDEX", subc="SEARCH", ktype="bool", var="searchindex"),
         
         Template("DOESEARCH", subc="ENTITYSEARCH", ktype="bool", var="doesearch"),
         Template("ETYPE", subc="ENTITYSEARCH", ktype="str", var="etype", islist=False),
         Template("SUFFIX", subc="ENTITYSEARCH", ktype="varname", var="esuffix", islist=False),
         Template("OUTSIZE", subc="ENTITYSEARCH", ktype="int", var="outsize", vallist=[1,]),
+        Template("PROCESSES", subc="ENTITYSEARCH", ktype="int", var="eprocesses", vallist=[1, 256]),
+        Template("PREFILTER", subc="ENTITYSEARCH", ktype="bool", var="eprefilter"),
         
         Template("DOLEXICON", subc="LEXICON", ktype="bool", var="dolexicon"),
         Template("DSNAME", subc="LEXICON", ktype="varname", var="lexdsname"),
@@ -728,7 +923,14 @@ def  Run(args):
                  vallist=["utf8", "locale"]), 
     
         Template("DOSTEMS", subc="STEMS", ktype="bool", var="dostems"),
-        Template("SUFFIX", subc="STEMS", ktype="varname", var="stemssuffix")])
+        Template("SUFFIX", subc="STEMS", ktype="varname", var="stemssuffix"),
+        
+        Template("CACHESTATS", subc="OPTIONS", ktype="bool", var="cachestats"),
+        Template("CACHEMB", subc="OPTIONS", ktype="int", var="cachemb", vallist=[1]),
+        Template("SAVESTEMS", subc="OPTIONS", ktype="bool", var="savestems"),
+        Template("LOADTIMES", subc="OPTIONS", ktype="bool", var="loadtimesreport"),
+        Template("DOWNLOAD", subc="OPTIONS", ktype="bool", var="download"),
+        Template("TIMING", subc="OPTIONS", ktype="bool", var="timing")])
         
 
     #enable localization
@@ -765,3 +967,5 @@ try:    #override
     from extension import helper
 except:
     pass        
+
+recordload("STATS_TEXTANALYSIS", importstart)
@@ -0,0 +1,160 @@
+# persistent spelling correction cache
+
+# Author: Jon K Peck
+# History
+# 18-oct-2026 Initial version
+# 18-oct-2026 Compiled snapshots of the extra dictionary word counts
+# 18-oct-2026 Close the cache file connections
+
+# Spelling corrections are kept in an SQLite file so that later sessions
+# can reuse them.  Entries are keyed by a dictionary key, which identifies
+# the language, the spell checker version, and the extra dictionaries loaded,
+# and by the word as written.  When the file holds more than the maximum
+# number of entries, the least recently used ones are removed.
+# The word counts of an extra dictionary file are also compiled into a
+# snapshot file, so later sessions read them in one marshal load instead of
+# tokenizing and counting the whole text file again.
+# This module does not use spss, so it can be used outside of Statistics.
+
+import sqlite3, time, os, hashlib, marshal, sys
+from contextlib import closing
+
+SPELLCACHE_NAME = "spelling.db"
+SNAPSHOT_VERSION = 1
+
+def filefingerprint(filespec):
+    """Return a fingerprint of the contents of filespec"""
+
+    h = hashlib.sha1()
+    with open(filespec, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def snapshotfile(directory, filespec):
+    """Return the word count snapshot file in directory for the extra dictionary filespec"""
+
+    name = hashlib.sha1(os.path.abspath(filespec).encode("utf-8", "surrogatepass")).hexdigest()
+    return os.path.join(directory, "extradict-{0}.dat".format(name))
+
+def wordcounts(filespec, snapshot, key, count):
+    """Return the word counts of the extra dictionary filespec and its fingerprint
+
+    snapshot is the snapshot file for filespec.
+    key identifies how the words are counted, such as the spell checker version.
+    count is called with filespec to count the words if the snapshot cannot be used.
+    The snapshot is used if it was made with key from a file with the same
+    size and modification time or, failing that, with the same fingerprint,
+    and otherwise it is made again.  An error reading filespec is raised"""
+
+    st = os.stat(filespec)
+    stamp = (st.st_size, st.st_mtime_ns)
+    try:
+        with open(snapshot, "rb") as f:
+            version, pyversion, snapkey, snapstamp, fingerprint = marshal.load(f)
+            if (version, pyversion, snapkey) == (SNAPSHOT_VERSION, sys.version, key) and \
+                    (tuple(snapstamp) == stamp or filefingerprint(filespec) == fingerprint):
+                return marshal.load(f), fingerprint
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+    counts = count(filespec)
+    fingerprint = filefingerprint(filespec)
+    temp = snapshot + ".{0}.tmp".format(os.getpid())
+    try:
+        with open(temp, "wb") as f:
+            marshal.dump((SNAPSHOT_VERSION, sys.version, key, stamp, fingerprint), f)
+            marshal.dump(counts, f)
+        os.replace(temp, snapshot)
+    except OSError:
+        # the words will just be counted again next time
+        try:
+            os.remove(temp)
+        except OSError:
+            pass
+    return counts, fingerprint
+
+class SpellCache:
+    """Word corrections for one dictionary key, optionally saved in an SQLite file
+
+    path is the database file or None for a cache that lasts only for the session.
+    dictkey identifies the dictionary set.
+    maxentries is the maximum number of entries kept in the file across all keys.
+
+    The entries for the key are read into memory when the cache is created,
+    so lookups do not touch the file.  New entries and the use times of hits
+    are written by flush"""
+
+    def __init__(self, path, dictkey, maxentries=500000):
+        self.path = path
+        self.dictkey = dictkey
+        self.maxentries = maxentries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.corrections = {}
+        self.new = {}
+        self.used = set()
+        if path is None:
+            return
+        with closing(self.connect()) as con, con:
+            self.corrections = dict(con.execute(
+                "SELECT word, correction FROM corrections WHERE dictkey = ?", (dictkey,)))
+
+    def connect(self):
+        """Return a connection to the file, creating the table if needed
+
+        The caller must close it.  Using the connection in a with statement
+        only commits or rolls back, so it is also wrapped in closing"""
+
+        con = sqlite3.connect(self.path, timeout=30)
+        try:
+            con.execute("""CREATE TABLE IF NOT EXISTS corrections
+                (dictkey TEXT, word TEXT, correction TEXT, used REAL, PRIMARY KEY (dictkey, word))""")
+            con.execute("CREATE INDEX IF NOT EXISTS corrections_used ON corrections (used)")
+        except:
+            con.close()
+            raise
+        return con
+
+    def get(self, word):
+        """Return the cached correction of word or None"""
+
+        result = self.corrections.get(word)
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.used.add(word)
+        return result
+
+    def put(self, word, correction):
+        """Add the correction of word"""
+
+        self.corrections[word] = correction
+        self.new[word] = correction
+
+    def flush(self):
+        """Write new entries and use times to the file and evict the oldest entries if it is too large"""
+
+        if self.path is None or not (self.new or self.used):
+            return
+        now = time.time()
+        key = self.dictkey
+        with closing(self.connect()) as con, con:
+            con.executemany("UPDATE corrections SET used = ? WHERE dictkey = ? AND word = ?",
+                ((now, key, word) for word in self.used if word not in self.new))
+            con.executemany("INSERT OR REPLACE INTO corrections VALUES (?, ?, ?, ?)",
+                ((key, word, correction, now) for word, correction in self.new.items()))
+            excess = con.execute("SELECT COUNT(*) FROM corrections").fetchone()[0] - self.maxentries
+            if excess > 0:
+                con.execute("""DELETE FROM corrections WHERE rowid IN
+                    (SELECT rowid FROM corrections ORDER BY used LIMIT ?)""", (excess,))
+                self.evictions += excess
+        self.new = {}
+        self.used = set()
+
+    def stats(self):
+        """Return a list of (label, value) pairs describing cache use"""
+
+        return [("Hits", self.hits), ("Misses", self.misses), ("Entries", len(self.corrections)),
+            ("Evicted", self.evictions)]
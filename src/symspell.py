@@ -0,0 +1,197 @@
+# symmetric delete spelling correction
+
+# Author: Jon K Peck
+# History
+# 18-oct-2026 Initial version
+
+# This is an alternative to the correction method of pyspellchecker.  That
+# method generates every string within two edits of an unknown word and looks
+# each one up, which is several hundred thousand strings for a typical word.
+# Here every dictionary word is indexed under the strings formed by deleting
+# up to two characters from its first PREFIXLENGTH characters, so the
+# candidates for a word are found by looking up the deletes of the word itself
+# and checking their true edit distance (Wolf Garbe, SymSpell).
+# The ranking is the same as pyspellchecker: among the candidates at the
+# smallest distance, those that match the word apart from diacritics are
+# preferred, and then the most frequent word is chosen.  Frequency ties,
+# which pyspellchecker breaks arbitrarily, go to the alphabetically first word.
+# This module does not use spss, so it can be used outside of Statistics.
+
+import marshal, os, string, sys, unicodedata
+
+PREFIXLENGTH = 7
+MAXDISTANCE = 2
+INDEX_VERSION = 1
+
+def deletes(word, distance=MAXDISTANCE):
+    """Return the set of strings formed by deleting up to distance characters from word"""
+
+    result = {word}
+    edge = result
+    for d in range(distance):
+        nextedge = set()
+        for w in edge:
+            if len(w) > 1:
+                for i in range(len(w)):
+                    nextedge.add(w[:i] + w[i+1:])
+        result = result | nextedge
+        edge = nextedge
+    return result
+
+def damerau(a, b):
+    """Return the Damerau-Levenshtein distance between strings a and b
+
+    Transpositions of adjacent characters count as one edit, and other
+    edits may be made between the transposed characters, so this is the
+    smallest number of insertions, deletions, substitutions, and transpositions
+    that change a into b"""
+
+    lasta = {}
+    maxdist = len(a) + len(b)
+    d = [[maxdist] * (len(b) + 2)]
+    d.extend([maxdist, i] + [0] * len(b) for i in range(len(a) + 1))
+    d[1][1:] = range(len(b) + 1)
+    for i in range(1, len(a) + 1):
+        lastb = 0
+        for j in range(1, len(b) + 1):
+            i1 = lasta.get(b[j-1], 0)
+            j1 = lastb
+            if a[i-1] == b[j-1]:
+                cost = 0
+                lastb = j
+            else:
+                cost = 1
+            d[i+1][j+1] = min(d[i][j] + cost, d[i+1][j] + 1, d[i][j+1] + 1,
+                d[i1][j1] + (i - i1 - 1) + 1 + (j - j1 - 1))
+        lasta[a[i-1]] = i
+    return d[len(a) + 1][len(b) + 1]
+
+def removediacritics(word):
+    nfkd = unicodedata.normalize("NFKD", word)
+    return "".join(c for c in nfkd if not unicodedata.combining(c))
+
+class SymSpell:
+    """Spelling correction from a symmetric delete index
+
+    wordfrequency is the pyspellchecker WordFrequency object of the
+    dictionary, including any extra words.  The index covers the words it
+    has when the object is created"""
+
+    def __init__(self, wordfrequency):
+        self.frequency = wordfrequency.dictionary
+        self.longest = wordfrequency.longest_word_length
+        self.words = None
+        self.index = None
+
+    def checkable(self, word):
+        """Return whether word is a candidate for correction, as in pyspellchecker"""
+
+        if len(word) == 1 and word in string.punctuation:
+            return False
+        if len(word) > self.longest + 3:
+            return False
+        if word.lower() in ("nan", "inf", "infinity"):
+            return True
+        try:    # numbers are not checked
+            float(word)
+            return False
+        except ValueError:
+            return True
+
+    def build(self):
+        """Build the delete index"""
+
+        self.words = sorted(w for w in self.frequency if self.checkable(w))
+        index = {}
+        for i, w in enumerate(self.words):
+            for key in deletes(w[:PREFIXLENGTH]):
+                entry = index.get(key)
+                # most keys have a single word, which is stored as a plain int
+                if entry is None:
+                    index[key] = i
+                elif type(entry) is int:
+                    index[key] = [entry, i]
+                else:
+                    entry.append(i)
+        self.index = index
+
+    def load(self, filespec, dictkey):
+        """Load the index from filespec and return True if it was saved for dictkey and this Python"""
+
+        try:
+            with open(filespec, "rb") as f:
+                header = marshal.load(f)
+                if header != (INDEX_VERSION, sys.version, dictkey, len(self.frequency)):
+                    return False
+                self.words, self.index = marshal.load(f)
+            return True
+        except (OSError, EOFError, ValueError, TypeError):
+            return False
+
+    def save(self, filespec, dictkey):
+        """Save the index in filespec, replacing it atomically"""
+
+        temp = filespec + ".{0}.tmp".format(os.getpid())
+        try:
+            with open(temp, "wb") as f:
+                marshal.dump((INDEX_VERSION, sys.version, dictkey, len(self.frequency)), f)
+                marshal.dump((self.words, self.index), f)
+            os.replace(temp, filespec)
+        except OSError:
+            # the index will just be rebuilt next time
+            try:
+                os.remove(temp)
+            except OSError:
+                pass
+
+    def candidates(self, word):
+        """Return the set of dictionary words at the smallest distance, up to MAXDISTANCE, from word
+
+        word is in lower case"""
+
+        found = set()
+        for key in deletes(word[:PREFIXLENGTH]):
+            entry = self.index.get(key)
+            if entry is None:
+                continue
+            if type(entry) is int:
+                found.add(entry)
+            else:
+                found.update(entry)
+        best = MAXDISTANCE + 1
+        result = set()
+        words = self.words
+        for i in found:
+            w = words[i]
+            if abs(len(w) - len(word)) > min(best, MAXDISTANCE):
+                continue
+            dist = damerau(word, w)
+            if dist > MAXDISTANCE:
+                continue
+            if dist < best:
+                best = dist
+                result = {w}
+            elif dist == best:
+                result.add(w)
+        return result
+
+    def correction(self, word):
+        """Return the most probable spelling of word or None if there is no candidate
+
+        The result follows pyspellchecker's correction except for frequency ties.
+        Like that, a known word is returned as written"""
+
+        lword = word.lower()
+        if lword in self.frequency and self.checkable(lword):
+            return word
+        if not self.checkable(word):
+            return word
+        candidates = self.candidates(lword)
+        if not candidates:
+            return None
+        noaccents = removediacritics(word)
+        preferred = [c for c in candidates if removediacritics(c) == noaccents]
+        if preferred:
+            candidates = preferred
+        frequency = self.frequency
+        return min(candidates, key=lambda c: (-frequency[c], c))
@@ -0,0 +1,149 @@
+# compact WordNet synonym index for SEARCH term expansion
+
+# Author: Jon K Peck
+# History
+# 18-oct-2026 Initial version
+
+# Looking up the synonyms of a search term with wordnet.synsets loads WordNet
+# and, for languages other than English, the Open Multilingual Wordnet data,
+# which takes several seconds even for a one-word search.  This index is built
+# once per language from WordNet by looking up every lemma name of the
+# language, so it gives exactly what synsets and lemma_names give for those
+# words, and it is saved in a file that is read through mmap.  A lookup is a
+# binary search of the sorted words, so WordNet is not loaded at all.  Words
+# that are not lemma names, such as inflected English forms, which synsets
+# finds through morphy, are not in the index, and the caller must ask WordNet.
+# This module does not use spss, so it can be used outside of Statistics.
+
+import os, sys, marshal, mmap, struct
+from array import array
+
+SYNINDEX_VERSION = 1
+# the part of speech keys: one part of speech or ALLPOS for synsets with no pos
+ALLPOS = "*"
+POSKEYS = ["n", "v", "r", "s", ALLPOS]
+GROUPSEP = "\x1e"    # separates the synonyms of each part of speech
+NAMESEP = "\x1f"    # separates the synonyms
+
+def lemmasynonyms(wn, word, pos, lang):
+    """Return the list of lemma names of the synsets of word as SEARCH uses them
+
+    pos is a part of speech or ALLPOS.  Underscores are replaced with hyphens"""
+
+    syns = wn.synsets(word, lang=lang) if pos == ALLPOS else wn.synsets(word, pos=pos, lang=lang)
+    return [item.replace("_", "-") for syn in syns for item in syn.lemma_names(lang=lang)]
+
+def build(wn, lang, filespec, key):
+    """Build the index of lang from the WordNet reader wn and save it in filespec with key
+
+    key identifies the WordNet data the index was built from"""
+
+    entries = {}
+    for word in set(name.lower() for name in wn.all_lemma_names(lang=lang)):
+        groups = []
+        for pos in POSKEYS:
+            names = lemmasynonyms(wn, word, pos, lang)
+            if names:
+                groups.append(pos + NAMESEP.join(names))
+        entries[word.encode("utf-8")] = GROUPSEP.join(groups).encode("utf-8")
+    words = sorted(entries)
+    keyoffsets = array("I", [0])
+    valueoffsets = array("I", [0])
+    for w in words:
+        keyoffsets.append(keyoffsets[-1] + len(w))
+        valueoffsets.append(valueoffsets[-1] + len(entries[w]))
+    head = marshal.dumps((SYNINDEX_VERSION, key, sys.byteorder, len(words)))
+    head += b"\0" * (-len(head) % 4)    # align the offsets
+    temp = filespec + ".{0}.tmp".format(os.getpid())
+    try:
+        with open(temp, "wb") as f:
+            f.write(struct.pack("<I", len(head)))
+            f.write(head)
+            f.write(keyoffsets.tobytes())
+            f.write(valueoffsets.tobytes())
+            f.write(b"".join(words))
+            f.write(b"".join(entries[w] for w in words))
+        os.replace(temp, filespec)
+    except OSError:
+        # the index will just be built again next time
+        try:
+            os.remove(temp)
+        except OSError:
+            pass
+        raise
+
+class SynonymIndex:
+    """The saved synonym index of one language, read through mmap
+
+    Use open to get an index"""
+
+    def __init__(self, f, mm, nwords, start):
+        self.file = f
+        self.mm = mm
+        self.nwords = nwords
+        size = 4 * (nwords + 1)
+        view = memoryview(mm)
+        self.keyoffsets = view[start:start + size].cast("I")
+        self.valueoffsets = view[start + size:start + 2 * size].cast("I")
+        self.keystart = start + 2 * size
+        self.valuestart = self.keystart + self.keyoffsets[nwords]
+
+    @classmethod
+    def open(cls, filespec, key):
+        """Return the index saved in filespec or None if there is none built with key"""
+
+        try:
+            f = open(filespec, "rb")
+        except OSError:
+            return None
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            headlength = struct.unpack("<I", mm[:4])[0]
+            version, filekey, byteorder, nwords = marshal.loads(mm[4:4 + headlength])
+            if (version, filekey, byteorder) == (SYNINDEX_VERSION, key, sys.byteorder):
+                return cls(f, mm, nwords, 4 + headlength)
+            mm.close()
+        except (OSError, EOFError, ValueError, TypeError, struct.error):
+            pass
+        f.close()
+        return None
+
+    def close(self):
+        self.keyoffsets.release()
+        self.valueoffsets.release()
+        self.mm.close()
+        self.file.close()
+
+    def find(self, word):
+        """Return the position of word in the index or None"""
+
+        target = word.encode("utf-8")
+        mm, offsets, start = self.mm, self.keyoffsets, self.keystart
+        lo, hi = 0, self.nwords
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if mm[start + offsets[mid]:start + offsets[mid + 1]] < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.nwords and mm[start + offsets[lo]:start + offsets[lo + 1]] == target:
+            return lo
+        return None
+
+    def synonyms(self, word, pos):
+        """Return the list of synonyms of word for pos, a part of speech or ALLPOS, or None if word is not in the index
+
+        word is in lower case.  The list is the same as from lemmasynonyms"""
+
+        i = self.find(word)
+        if i is None:
+            return None
+        offsets = self.valueoffsets
+        groups = self.mm[self.valuestart + offsets[i]:self.valuestart + offsets[i + 1]].decode("utf-8")
+        for group in groups.split(GROUPSEP):
+            if group[:1] == pos:
+                return group[1:].split(NAMESEP)
+        return []
+
+    def __len__(self):
+        return self.nwords
@@ -1,5 +1,5 @@
 # text analysis functions
-# These are meant to be used with the SPSSINC TRANS extension command
+# These are used by STATS TEXTANALYSIS, and most can also be used with the SPSSINC TRANS extension command
 
 # Author: Jon K Peck
 # History
@@ -11,6 +11,33 @@
 # 03-jun-2021 surface exception if vader_lexicon is not installed
 # 09-jan-2023 Allow , decimal in score.  Stipulate utf-8 encoding in sentiment, emphasis, and negation text files
 # 26-feb-2023 Add support for German sentiment
+# 18-oct-2026 Batch sentiment scoring and block read/write of case data
+# 18-oct-2026 Stream weighted frequency counts instead of replicating tokens
+# 18-oct-2026 Optional process pool for frequency counting
+# 18-oct-2026 Approximate frequency counts in bounded memory
+# 18-oct-2026 Single pass execution plan for the per-case tasks
+# 18-oct-2026 Persistent spelling correction cache
+# 18-oct-2026 Symmetric delete spelling engine
+# 18-oct-2026 SEARCH from saved inverted indexes
+# 18-oct-2026 Bounded caches for n-grams, stems, and sentiment scores with use statistics
+# 18-oct-2026 Batched entity search with optional process pool
+# 18-oct-2026 Entity search prefilter and memo of entities by tokens
+# 18-oct-2026 Memos of per-case results by text for spelling, stems, and search
+# 18-oct-2026 Stem tables saved between sessions and shared with worker processes
+# 18-oct-2026 Load the sentiment analyzer, names, and spell checker on first use
+# 18-oct-2026 Timing of each task by variable
+# 18-oct-2026 Load extra spelling dictionaries from compiled word count snapshots
+# 18-oct-2026 Selectable regular expression tokenizer
+# 18-oct-2026 WordNet synonym index for SEARCH
+# 18-oct-2026 Per-case functions take their parameters as arguments instead of STATS_TEXTANALYSIS globals
+# 18-oct-2026 Create the lexicon and special terms datasets with one GET DATA
+# 18-oct-2026 German lexicon cache in the per-user cache directory
+# 18-oct-2026 Write the new variables in the same pass as the cases are computed
+# 18-oct-2026 Saved SEARCH indexes depend on the nltk version
+# 18-oct-2026 Numeric formats of the words datasets fit the values, and empty datasets skip GET DATA
+# 18-oct-2026 Compute the new variables a block at a time and save the blocks for the write pass
+# 18-oct-2026 Fallback for the translation function _ when Statistics does not provide it
+# 18-oct-2026 Replaced variables are deleted only after the new values are written
 
 # Citations:
 # nltk
@@ -31,10 +58,38 @@
 #except:
     #pass
 
-import spss, spssdata, spssaux, re, nltk, sys
+import spss, spssdata, spssaux, re, nltk, sys, os, tempfile, time, csv, itertools, marshal
+from collections import deque
+from contextlib import contextmanager
+import textaworker, spellcache, symspell, textindex, textcache, hashlib
+import synindex, textresources
+
+# enable localization.  The reports here run on every command, and Run defines its
+# fallback only in STATS_TEXTANALYSIS, so the same fallback is needed here
+try:
+    _("---")
+except NameError:
+    def _(msg):
+        return msg
 
 m = sys.modules["STATS_TEXTANALYSIS"]  # for referring to the global variables there
 
+# the TOKENIZER setting and its sentence tokenizer.  See textaworker
+tokenizer = "nltk"
+splitsentences = textaworker.nltksentences
+
+def settokenizer(name):
+    """Use the tokenizer called name, "nltk" or "regex", for the tasks"""
+
+    global tokenizer, splitsentences
+    tokenizer = name
+    splitsentences = textaworker.TOKENIZERS[name]
+
+def wordtokens(text):
+    """Return the list of tokens of text, which is word_tokenize(text) with the nltk tokenizer"""
+
+    return [w for s in splitsentences(text) for w in s]
+
 #from nltk.stem.lancaster import LancasterStemmer
 #st = LancasterStemmer()
 ###pst = nltk.PorterStemmer()
@@ -50,6 +105,22 @@ m = sys.modules["STATS_TEXTANALYSIS"]  # for referring to the global variables t
 
 extraspelldict = None
 
+def cachedir():
+    """Return the directory for files kept between sessions, creating it if necessary
+
+    It is STATS_TEXTANALYSIS under the local application data directory on Windows
+    and under ~/.cache elsewhere or, if that is not writable, in the temporary directory"""
+
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    for d in [os.path.join(base, "STATS_TEXTANALYSIS"), os.path.join(tempfile.gettempdir(), "STATS_TEXTANALYSIS")]:
+        try:
+            os.makedirs(d, exist_ok=True)
+        except OSError:
+            continue
+        if os.access(d, os.W_OK):
+            return d
+    raise ValueError(_("No writable directory was found for the text analysis cache files"))
+
 #*****************************************************************
 #This function takes as input a string variable and produces frequency counts
 #of words, bigrams (pairs of words) and trigrams (triples of words) ignoring case
@@ -71,14 +142,26 @@ extraspelldict = None
 
 # freqslist handles a list of variables producing word counts for each
 
-def freqslist(varlist, stem=False, stemcode=None, stemmerlang=None, count=10):
+def freqslist(varlist, stem=False, stemcode=None, stemmerlang=None, count=10, processes=1, maxitems=None):
     vardict = spssaux.VariableDict(varlist)
     weightvar = spss.GetWeightVar()
-    for v in varlist:
-        freqs(v, vardict[v].VariableLabel, weightvar, stem, stemcode, stemmerlang, count)
+    pool = None
+    if processes > 1:
+        # one pool serves all the variables
+        pool = makepool(processes, textaworker.initcounts,
+            (stem and stemmerlang or None, freqstopwords(), maxitems, stem and stemtable(stemmerlang) or None,
+            tokenizer))
+    try:
+        for v in varlist:
+            freqs(v, vardict[v].VariableLabel, weightvar, stem, stemcode, stemmerlang, count, pool, processes,
+                maxitems)
+    finally:
+        if pool is not None:
+            pool.terminate()
         
 
-def freqs(varname, label="", weightvar=None, stem=False, stemcode=None, stemmerlang=None, count=10):
+def freqs(varname, label="", weightvar=None, stem=False, stemcode=None, stemmerlang=None, count=10,
+        pool=None, processes=1, maxitems=None):
     """Display word, bigram, and trigram counts
     
     varname is the text variable to analyze
@@ -88,6 +171,10 @@ def freqs(varname, label="", weightvar=None, stem=False, stemcode=None, stemmerl
     stemcode is the function for stemming
     stemmerlang is the stemming language
     counts is the number of instances to display
+    pool is a process pool from makepool initialized with textaworker.initcounts or None
+    processes is the number of processes in the pool
+    maxitems is None for exact counts or the number of items per table
+    to keep for approximate counts.  See textaworker.FrequentItems
     """
 
     if weightvar:
@@ -95,56 +182,31 @@ def freqs(varname, label="", weightvar=None, stem=False, stemcode=None, stemmerl
     else:
         tofetch = varname
 
-    allwords = []
-    bigr = []
-    trigr = []
-    weights = []
-    hastextcount = 0
-    caseweight = 1    # unweighted
+    # counts are accumulated as the cases stream by, so memory depends on the
+    # vocabulary size, or on maxitems if approximate, not on the number of cases or the size of the weights
+    fd, bfd, tfd = textaworker.makecounters(maxitems)
     
     # loop over cases and accumulate words, bigrams, and trigrams for frequency tables
     curs = spssdata.Spssdata(tofetch, names=False)
-    for case in curs:
-        t = case[0].rstrip()
-        if len(t) == 0:
-            continue
-        hastextcount += 1
-        if weightvar:
-            caseweight = round(case[1])   # round returns an integer
-        sentences = nltk.tokenize.sent_tokenize(t)
-        # treat each sentence separately
-        for s in sentences:
-            wordlist = [w.lower() for w in nltk.word_tokenize(s)]
-            if stem:
-                words = [stemcode(w) for w in wordlist if w.isalpha()]
-            else:
-                words = [w for w in wordlist if w.isalpha()]
-            if m.laststopwordslang != "none":
-                words = [w for w in words if not w in m.sstopwords]
-            allwords.append(caseweight * words)   # flatten later
-            # replicate the n-grams according to the case weight
-            for w in nltk.bigrams(words):
-                if len(set(w)) == len(w):  # don't add it unless elements are unique
-                    bigr.extend(w for i in range(caseweight))
-            for w in nltk.trigrams(words):
-                if len(set(w)) == len(w):
-                    trigr.extend(w for i in range(caseweight))
+    try:
+        if pool is None:
+            hastextcount = textaworker.countcases(curs, weightvar, fd, bfd, tfd,
+                stem and stemcode or None, freqstopwords(), tokenizer)
+        else:
+            hastextcount = poolcounts(pool, processes, curs, weightvar, fd, bfd, tfd)
+    finally:
+        curs.CClose()
+    freqtables(varname, label, weightvar, stem, stemmerlang, count, maxitems, fd, bfd, tfd, hastextcount)
 
-    curs.CClose()
-    
-    
-    #flatten the list
-    allwords = [item for sublist in allwords for item in sublist]        
-    if len(allwords) == 0:
+def freqtables(varname, label, weightvar, stem, stemmerlang, count, maxitems, fd, bfd, tfd, hastextcount):
+    """Display the word, bigram, and trigram frequency tables for a variable
+
+    fd, bfd, and tfd are the counters and hastextcount the number of cases with text.
+    The other parameters are as for freqs"""
+
+    if len(fd) == 0:
         print("Variable {0} has no text".format(varname))
         return    
-    fd = nltk.FreqDist(allwords)
-    if weightvar and len(fd) == 0:
-        print(_("The weighted counts are zero"))
-        return
-    
-    bfd = nltk.FreqDist(bigr)
-    tfd = nltk.FreqDist(trigr)
     
     pt = spss.StartProcedure("Text Analysis")
     spss.AddProcedureFootnotes("Case and stopwords are ignored")
@@ -152,12 +214,24 @@ def freqs(varname, label="", weightvar=None, stem=False, stemcode=None, stemmerl
         spss.AddProcedureFootnotes("Words have been stemmed using stemmer {0}".format(stemmerlang))
     else:
         spss.AddProcedureFootnotes("Words have not been stemmed")
+    if tokenizer != "nltk":
+        spss.AddProcedureFootnotes("Words were found by the regular expression tokenizer")
     spss.AddProcedureFootnotes("{0} most common items".format(count))
     spss.AddProcedureFootnotes("{0} cases have text".format(hastextcount))
+    if maxitems:
+        # each count shown is low by at most the amount subtracted while pruning
+        spss.AddProcedureFootnotes("Counts are approximate with at most {0} items kept per table".format(maxitems))
+        spss.AddProcedureFootnotes(
+            "Maximum undercount of any item: words {0:g}, bigrams {1:g}, trigrams {2:g}".format(
+            fd.decrement, bfd.decrement, tfd.decrement))
     if weightvar:
-        spss.AddProcedureFootnotes("Frequencies are based on rounded weights")
+        spss.AddProcedureFootnotes("Frequencies are weighted by {0}".format(weightvar))
+        # weights need not be integers
+        countformat = spss.FormatSpec.GeneralStat
+    else:
+        countformat = spss.FormatSpec.Count
     pt = spss.BasePivotTable("Word Frequencies for {0}\n {1} ".format(varname, label), "WordFrequencies")
-    pt.SetDefaultFormatSpec(spss.FormatSpec.Count)
+    pt.SetDefaultFormatSpec(countformat)
     labels, counts = zip(*fd.most_common(count))
     pt.SimplePivotTable(rowlabels=labels,
         collabels=["{}".format("Word Frequency")],
@@ -168,7 +242,7 @@ def freqs(varname, label="", weightvar=None, stem=False, stemcode=None, stemmerl
         if len(labels) > 0:
             labels = ["{0} {1}".format(item[0], item[1]) for item in labels]
             pt = spss.BasePivotTable("Bigram Frequencies for {0} \n {1}".format(varname, label), "BigramFrequencies")
-            pt.SetDefaultFormatSpec(spss.FormatSpec.Count)
+            pt.SetDefaultFormatSpec(countformat)
             pt.SimplePivotTable(rowlabels=labels,
                 collabels=["Bigram Frequency"],
                 cells=counts)
@@ -180,7 +254,7 @@ def freqs(varname, label="", weightvar=None, stem=False, stemcode=None, stemmerl
         if len(labels) > 0:
             labels = ["{0} {1} {2}".format(item[0], item[1], item[2]) for item in labels]
             pt = spss.BasePivotTable("Trigram Frequencies for {0} \n {1}".format(varname, label), "TrigramFrequencies")
-            pt.SetDefaultFormatSpec(spss.FormatSpec.Count)
+            pt.SetDefaultFormatSpec(countformat)
             pt.SimplePivotTable(rowlabels=labels,
                 collabels=["Trigram Frequency"],
                 cells=counts)
@@ -188,18 +262,643 @@ def freqs(varname, label="", weightvar=None, stem=False, stemcode=None, stemmerl
         print(_("No trigrams were found for variable {0}".format(varname)))
     spss.EndProcedure()    
 
-try:
-    from nltk.sentiment import SentimentIntensityAnalyzer
-    sia = SentimentIntensityAnalyzer()
-    # German
-    if sys.modules['STATS_TEXTANALYSIS'].sentlanguage == "german":
-        from vaderSentimentGER import SentimentIntensityAnalyzer
-        sia = SentimentIntensityAnalyzer()
-except:
-    # Can't raise exception here as exception details will be suppressed higher up
-    print("*** The English or German vader_lexicon file was not found.  For English, use nltk.download() to install it.")
-    raise 
+def freqstopwords():
+    """return the set of stopwords to drop from frequency counts"""
+    
+    if m.laststopwordslang != "none":
+        return m.sstopwords
+    return frozenset()
+
+CHUNKSIZE = 2000
+
+def poolcounts(pool, processes, cases, weighted, fd, bfd, tfd):
+    """Count words and n-grams of cases in the worker pool and return the number with text
+    
+    cases are read here in chunks, since the cursor can only be used in this thread.
+    Chunk results are merged into fd, bfd, and tfd in chunk order, which gives
+    the same counts and the same order of tied items as counting serially.
+    At most two chunks per process are outstanding"""
+    
+    hastextcount = 0
+    pending = deque()
+    
+    def merge():
+        nonlocal hastextcount
+        cfd, cbfd, ctfd, ccount = pending.popleft().get()
+        fd.update(cfd)
+        bfd.update(cbfd)
+        tfd.update(ctfd)
+        hastextcount += ccount
+        
+    chunk = []
+    for case in cases:
+        chunk.append(tuple(case))
+        if len(chunk) == CHUNKSIZE:
+            pending.append(pool.apply_async(textaworker.countchunk, (chunk, weighted)))
+            chunk = []
+            if len(pending) >= 2 * processes:
+                merge()
+    if chunk:
+        pending.append(pool.apply_async(textaworker.countchunk, (chunk, weighted)))
+    while pending:
+        merge()
+    return hastextcount
+
+def pythonexecutable():
+    """return the Python interpreter for worker processes or None if the current one will do
+    
+    Inside Statistics, sys.executable may be the Statistics executable rather than Python"""
+    
+    if os.path.basename(sys.executable).lower().startswith("python"):
+        return None
+    for loc in [sys.exec_prefix, os.path.join(sys.exec_prefix, "bin")]:
+        for name in ["python.exe", "python3", "python"]:
+            exe = os.path.join(loc, name)
+            if os.path.isfile(exe):
+                return exe
+    raise ValueError(_("The Python executable needed for multiple processes was not found"))
+
+def makepool(processes, initializer=None, initargs=()):
+    """Return a process pool with the specified number of worker processes
+    
+    processes is limited to the number of cpus
+    initializer and initargs are as for multiprocessing.Pool"""
+    
+    import multiprocessing
+    ctx = multiprocessing.get_context("spawn")
+    exe = pythonexecutable()
+    if exe:
+        ctx.set_executable(exe)
+    return ctx.Pool(min(processes, os.cpu_count() or 1), initializer, initargs)
+
+# The sentiment analyzer, the names list, and the spell checker are loaded when
+# a task first needs them rather than when this module is imported
+sia = None
+
+def sentimentanalyzer():
+    """Return the sentiment analyzer, creating it on first use
+
+    It is the German analyzer if the sentiment language is German at that time"""
+
+    global sia
+    if sia is None:
+        start = time.perf_counter()
+        try:
+            if m.sentlanguage == "german":
+                from vaderSentimentGER import SentimentIntensityAnalyzer
+                # the compiled lexicon is kept in the per-user cache directory
+                sia = SentimentIntensityAnalyzer(cachedir=cachedir())
+            else:
+                from nltk.sentiment import SentimentIntensityAnalyzer
+                sia = SentimentIntensityAnalyzer()
+        except:
+            # Can't raise exception here as exception details will be suppressed higher up
+            print("*** The English or German vader_lexicon file was not found.  For English, use nltk.download() to install it.")
+            raise 
+        m.recordload("sentiment analyzer", start)
+    return sia
+
+# polarity scores by text.  This must be cleared when the lexicon or special terms change
+sentimentcache = textcache.getcache("sentiment", 32 * textcache.MB)
+
+
+#*****************************************************************
+# Block processing without SPSSINC TRANS
+# readblocks passes the text variables to a function a block of cases at a time
+# and collects the result columns.  writecases adds new variables to the active
+# dataset and sets their values as each case is read.
+#*****************************************************************
+
+BLOCKSIZE = 1000
+
+def readblocks(varnames, blockfunc, ncols, convertUserMissing=False):
+    """Return result columns computed from the text variables a block at a time
+
+    varnames is the list of text variables to read
+    blockfunc is called with a list of text columns, one per variable, and
+    must return ncols result columns with one value per case in the block
+    convertUserMissing specifies whether user missing values are returned as None"""
+
+    result = [[] for i in range(ncols)]
+
+    def doblock(block):
+        for col, values in zip(result, blockfunc(list(zip(*block)))):
+            col.extend(values)
+
+    block = []
+    curs = spssdata.Spssdata(varnames, names=False, convertUserMissing=convertUserMissing)
+    for case in curs:
+        block.append(case)
+        if len(block) == BLOCKSIZE:
+            doblock(block)
+            block = []
+    curs.CClose()
+    if block:
+        doblock(block)
+    return result
+
+def writecases(varnames, outnames, outtypes, casefunc, convertUserMissing=False):
+    """Add or replace variables in the active dataset with values computed from each case
+
+    varnames is the list of variables to read
+    outnames is the list of variable names to create
+    outtypes is the list of types: 0 for numeric or the string width
+    casefunc is called with the tuple of varnames values of each case and
+    returns the list of values of the new variables for that case.
+    The write cursor commits each case when the next one is read, so the values
+    are written as they are computed, and nothing is kept for the whole dataset.
+    String values too long for their variable are truncated.
+    Existing variables being replaced are kept until all the cases are written,
+    and if that fails, the new variables are removed"""
+
+    # a cursor can only add variables, so the replacements are written under temporary
+    # names, and the existing variables are deleted only after that succeeds
+    existing = set(v.lower() for v in spssaux.VariableDict().variables)
+    taken = existing | set(name.lower() for name in outnames)
+    replaced = []
+    temporary = []
+    writenames = []
+    for name in outnames:
+        if name.lower() in existing:
+            tempname = name
+            n = 0
+            while tempname.lower() in taken:
+                n += 1
+                tempname = "T_TEXTA{0}".format(n)
+            taken.add(tempname.lower())
+            replaced.append(name)
+            temporary.append(tempname)
+            name = tempname
+        writenames.append(name)
+    committed = False
+    curs = spssdata.Spssdata(varnames, names=False, convertUserMissing=convertUserMissing, accessType='w')
+    try:
+        try:
+            for name, vtype in zip(writenames, outtypes):
+                curs.append(spssdata.vdef(name, vtype=vtype))
+            curs.commitdict()
+            committed = True
+            strings = [(i, vtype) for i, vtype in enumerate(outtypes) if vtype > 0]
+            for case in curs:
+                values = casefunc(case)
+                for i, width in strings:
+                    values[i] = fitwidth(values[i], width)
+                curs.casevalues(values)
+        finally:
+            curs.CClose()
+    except:
+        # leave the dataset as it was.  The original error is the one to report
+        if committed:
+            try:
+                spss.Submit("DELETE VARIABLES {0}.".format(" ".join(writenames)))
+            except:
+                pass
+        raise
+    if replaced:
+        spss.Submit(["DELETE VARIABLES {0}.".format(" ".join(replaced)),
+            "RENAME VARIABLES ({0} = {1}).".format(" ".join(temporary), " ".join(replaced))])
 
+def fitwidth(value, width):
+    """Return string value truncated to at most width bytes without splitting a character"""
+
+    if len(value) * 4 <= width:    # cannot be too long even in utf-8
+        return value
+    encoded = value.encode("utf-8")
+    if len(encoded) <= width:
+        return value
+    return encoded[:width].decode("utf-8", "ignore")
+
+#*****************************************************************
+# Execution plan.  The per-case tasks of a command all read the same text
+# variables, so runplan reads the cases once to compute every task a block
+# at a time, tokenizing each case at most once, and writes all the new
+# variables together in one more pass.
+#*****************************************************************
+
+class CaseText:
+    """The text of one case with its tokens computed on first use"""
+
+    __slots__ = ("text", "_sentences", "_tokens", "_lowertokens")
+
+    def __init__(self, text):
+        self.text = text
+        self._sentences = None
+        self._tokens = None
+        self._lowertokens = None
+
+    @property
+    def sentences(self):
+        """list of token lists, one per sentence, from the current tokenizer"""
+        if self._sentences is None:
+            self._sentences = splitsentences(self.text)
+        return self._sentences
+
+    @property
+    def tokens(self):
+        """list of tokens, the same as wordtokens(text)"""
+        if self._tokens is None:
+            self._tokens = [w for s in self.sentences for w in s]
+        return self._tokens
+
+    @property
+    def lowertokens(self):
+        """tuple of the tokens of the lower case text, the same as wordtokens(text.lower())
+
+        The text is lowered before tokenizing, as in haswords and stemtext, since
+        case can change how the text is split into sentences and words"""
+        if self._lowertokens is None:
+            self._lowertokens = tuple(w for s in splitsentences(self.text.lower()) for w in s)
+        return self._lowertokens
+
+class Task:
+    """A per-case task for runplan
+
+    outnames and outtypes are the variables to create, variable-major.
+    compute is called for each block of cases with a list of CaseText columns,
+    one per input variable, and a column of case weights or None, and it returns
+    one value column per output variable.
+    syntax is submitted after the variables are written
+    finish is called with no arguments after that
+    If results is not None, compute returns nothing, and results is called
+    after all the cases have been read to return the output columns
+    close is called after the data passes whether or not they succeed, e.g., to end a process pool
+    name labels the task in the timing report, usually the subcommand.
+    pervariable specifies whether compute can be called with some of the columns
+    and then returns the output columns of just those variables, which
+    allows the task to be timed for each variable"""
+
+    def __init__(self, outnames, outtypes, compute, syntax=None, finish=None, results=None, close=None,
+            name="", pervariable=True):
+        self.outnames = outnames
+        self.outtypes = outtypes
+        self.compute = compute
+        self.syntax = syntax
+        self.finish = finish
+        self.results = results
+        self.close = close
+        self.name = name
+        self.pervariable = pervariable
+
+class Timings:
+    """Wall time, cases, blank cases, and cache hits by task and variable
+
+    enabled specifies whether anything is recorded.  The rows are kept
+    in the order they are first recorded"""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.rows = {}    # [seconds, cases, blank cases, cache hits] by (task, variable)
+
+    def row(self, task, variable):
+        return self.rows.setdefault((task, variable), [0., None, None, 0])
+
+    @contextmanager
+    def measure(self, task, variable=""):
+        """Add the time and cache hits of the with block to the row for task and variable"""
+
+        if not self.enabled:
+            yield
+            return
+        row = self.row(task, variable)
+        hits = textcache.totalhits()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            row[0] += time.perf_counter() - start
+            row[3] += textcache.totalhits() - hits
+
+    def count(self, task, variable, cases):
+        """Add the number of cases in a list of CaseText and the number that are blank"""
+
+        row = self.row(task, variable)
+        row[1] = (row[1] or 0) + len(cases)
+        row[2] = (row[2] or 0) + sum(1 for case in cases if len(case.text) == 0)
+
+def timedcompute(task, varnames, texts, weights, timings):
+    """Return task.compute(texts, weights), recording its timings for each variable if possible"""
+
+    if not task.pervariable:
+        with timings.measure(task.name, _("All variables")):
+            result = task.compute(texts, weights)
+        for col in texts:
+            timings.count(task.name, _("All variables"), col)
+        return result
+    result = []
+    for varname, col in zip(varnames, texts):
+        with timings.measure(task.name, varname):
+            result.extend(task.compute([col], weights))
+        timings.count(task.name, varname, col)
+    return result
+
+def timingreport(timings):
+    """Add the timing table to the current procedure"""
+
+    if not timings.rows:
+        return
+    cells = []
+    for seconds, cases, blanks, hits in timings.rows.values():
+        if cases is None:
+            cells.append([seconds, "", "", "", hits])
+        else:
+            cells.append([seconds, cases, seconds and cases / seconds or "", blanks, hits])
+    pt = spss.BasePivotTable(_("Task Timing"), "TaskTiming")
+    pt.SimplePivotTable(rowdim=_("Task"),
+        rowlabels=[variable and "{0} {1}".format(task, variable) or task for task, variable in timings.rows],
+        coldim=_("Statistics"),
+        collabels=[_("Seconds"), _("Cases"), _("Cases per Second"), _("Blank Cases"), _("Cache Hits")],
+        cells=cells)
+
+# small integers for the parameter values of the text memos, so that keys stay small
+memoparams = {}
+
+def memocolumns(columns, name, params, func):
+    """Return func(case) for each CaseText in columns, computing it once per distinct text
+
+    columns is a sequence of lists of CaseText
+    name is the name of the cache for the results
+    params is a hashable value of everything other than the text that the results depend on.
+    Results are kept for the session, so repeated texts, such as "none" or "n/a", are
+    not even tokenized again in later blocks or later commands with the same parameters"""
+
+    cache = textcache.getcache(name, 16 * textcache.MB)
+    pid = memoparams.setdefault(params, len(memoparams))
+    found = {}
+    for col in columns:
+        for case in col:
+            key = (case.text, pid)
+            if key in found:
+                cache.hits += 1    # repeated in this block
+                continue
+            value = cache.get(key)
+            if value is textcache.MISSING:
+                value = func(case)
+                cache.put(key, value)
+            found[key] = value
+    return [[found[(case.text, pid)] for case in col] for col in columns]
+
+def runplan(varnames, tasks, weightvar=None, timings=None):
+    """Compute all the tasks a block of cases at a time and write their variables
+
+    varnames is the list of text variables
+    tasks is a list of Task objects
+    weightvar is the weight variable to read along with the text or None
+    timings is a Timings object or None
+
+    Every task is computed a block at a time in a read pass, and the values of
+    the new variables are saved block by block in a temporary file.  A write pass
+    then adds the variables, setting the values of each case from the saved
+    block as the cursor reaches it, so memory does not grow with the number of cases.
+    Tasks with results need all the cases first, so only their output columns
+    are kept until the write pass.  If no variables are created, there is only the read pass"""
+
+    if timings is None:
+        timings = Timings(False)
+    timed = timings.enabled
+    nvars = len(varnames)
+    outtasks = [task for task in tasks if task.outnames]
+    tofetch = varnames + [weightvar] if weightvar else varnames
+    # the block columns of the tasks without results
+    spool = outtasks and tempfile.TemporaryFile() or None
+
+    def compute(block):
+        # block is a list of value columns.  user missing text is treated as blank
+        texts = [[CaseText((t or "").rstrip()) for t in col] for col in block[:nvars]]
+        weights = block[nvars] if weightvar else None
+        result = []
+        for task in tasks:
+            if timed:
+                result.extend(timedcompute(task, varnames, texts, weights, timings))
+            else:
+                result.extend(task.compute(texts, weights))
+        if spool:
+            marshal.dump((len(block[0]), result), spool)
+        return []
+
+    try:
+        readblocks(tofetch, compute, 0, convertUserMissing=True)
+        results = {}
+        for task in tasks:
+            if task.results is not None:
+                with timings.measure(task.name, _("All variables")):
+                    results[task] = task.results()
+        if outtasks:
+            spool.seek(0)
+            # the size and columns of the current block, the position in it, and the case number
+            block = [0, [], 0, 0]
+
+            def casevalues(case):
+                if block[2] == block[0]:
+                    block[0], block[1] = marshal.load(spool)
+                    block[2] = 0
+                i, c = block[2], block[3]
+                computed = iter(block[1])
+                values = []
+                for task in outtasks:
+                    if task in results:
+                        values.extend(col[c] for col in results[task])
+                    else:
+                        values.extend(next(computed)[i] for name in task.outnames)
+                block[2] += 1
+                block[3] += 1
+                return values
+
+            outnames = [name for task in outtasks for name in task.outnames]
+            outtypes = [vtype for task in outtasks for vtype in task.outtypes]
+            with timings.measure(_("Write Variables")):
+                writecases(tofetch, outnames, outtypes, casevalues, convertUserMissing=True)
+    finally:
+        if spool:
+            spool.close()
+        for task in tasks:
+            if task.close:
+                task.close()
+    for task in tasks:
+        if task.syntax:
+            spss.Submit(task.syntax)
+        if task.finish:
+            task.finish()
+
+def cachereport():
+    """Display the use statistics of the caches used since the counts were reset"""
+
+    used = textcache.usedcaches()
+    if not used:
+        return
+    spss.StartProcedure("Text Analysis")
+    spss.AddProcedureFootnotes(_("Cache entries are kept for the session, so they may have been added by earlier commands"))
+    pt = spss.BasePivotTable(_("Cache Statistics"), "CacheStatistics")
+    cells = []
+    for cache in used:
+        hits, misses, evictions, entries, nbytes = cache.stats()
+        cells.append([hits, misses, 100. * hits / (hits + misses), evictions, entries,
+            nbytes / 1024., cache.maxbytes / 1024.])
+    pt.SimplePivotTable(rowdim=_("Cache"), rowlabels=[cache.name for cache in used],
+        coldim=_("Statistics"),
+        collabels=[_("Hits"), _("Misses"), _("Hit Percent"), _("Evictions"), _("Entries"),
+            _("Size (KB)"), _("Budget (KB)")],
+        cells=cells)
+    spss.EndProcedure()
+
+synindexes = {}    # SynonymIndex objects by language.  None if the index could not be saved
+
+def synonymkey(lang):
+    """Return the key identifying the WordNet data for the synonym index of lang"""
+
+    key = [nltk.__version__, lang]
+    for name in ["wordnet"] + (lang != "eng" and ["omw"] or []):
+        path = textresources.locate(name)
+        key.extend([path, textresources.stamp(path) if path else None])
+    return tuple(key)
+
+def synonymindex(lang):
+    """Return the saved synonym index for lang, building it if necessary, or None
+
+    The index is built from WordNet the first time a language is searched and
+    is saved in the cache directory.  It is rebuilt if WordNet changes"""
+
+    if lang in synindexes:
+        return synindexes[lang]
+    filespec = os.path.join(cachedir(), "synonyms-{0}.idx".format(lang))
+    key = synonymkey(lang)
+    index = synindex.SynonymIndex.open(filespec, key)
+    if index is None:
+        if lang not in m.wordnetlangs():
+            raise ValueError(_("Unsupported search language was specified: {0}").format(lang))
+        print(_("Building the synonym index for {0}.  It will be saved for later sessions.").format(lang))
+        try:
+            synindex.build(m.wn, lang, filespec, key)
+            index = synindex.SynonymIndex.open(filespec, key)
+        except OSError:
+            index = None
+    synindexes[lang] = index
+    return index
+
+def indexfile(varname, key):
+    """Return the file for the saved SEARCH index of varname
+
+    It is next to the data file if the active dataset has been saved and that
+    directory is writable and otherwise in the cache directory.
+    key distinguishes indexes of the same variable, e.g., for stemming"""
+
+    try:
+        datafile = spssaux.GetDatasetInfo("DataFile")
+    except:
+        datafile = None
+    if datafile and os.access(os.path.dirname(datafile) or ".", os.W_OK):
+        base = os.path.splitext(datafile)[0]
+        return "{0}.{1}.{2}.tidx".format(base, varname, key)
+    ident = "{0}/{1}/{2}".format(datafile or spss.ActiveDataset(), varname, key)
+    return os.path.join(cachedir(), "textindex-{0}.tidx".format(hashlib.sha1(ident.encode("utf-8")).hexdigest()))
+
+def indexedsearchtask(varnames, outnames, outtype, words, mode="anywords", searchstem=False, stemmerlang=None):
+    """Return a Task that answers a SEARCH from saved inverted indexes
+
+    The other parameters are as for haswords.  outtype is the output variable type.
+    Blocks of cases whose text differs from the saved index are tokenized
+    and reindexed during the pass, and the updated index is saved"""
+
+    stemcode = m.stemmergg
+    key = searchstem and "stem-" + stemmerlang or "nostem"
+    if tokenizer != "nltk":
+        key += "-" + tokenizer
+    files = [indexfile(v, key) for v in varnames]
+    # the block hashes only cover the text, and another nltk version might tokenize or stem differently
+    key += "/" + nltk.__version__
+    saved = [textindex.TextIndex.load(f, v + "/" + key, BLOCKSIZE) for f, v in zip(files, varnames)]
+    fresh = [textindex.TextIndex(v + "/" + key, BLOCKSIZE) for v in varnames]
+    changed = [set() for v in varnames]
+    hashes = [[] for v in varnames]
+    caseno = [0]
+
+    def compute(columns, weights):
+        start = caseno[0]
+        for i, col in enumerate(columns):
+            h = textindex.blockhash([case.text for case in col])
+            blockno = len(hashes[i])
+            hashes[i].append(h)
+            old = saved[i]
+            if old is not None and blockno < len(old.blockhashes) and old.blockhashes[blockno] == h:
+                continue
+            changed[i].add(blockno)
+            for j, case in enumerate(col):
+                if len(case.text) == 0:
+                    tokens = None
+                elif searchstem:
+                    tokens = tuple(stemcode(w) for w in case.lowertokens if w.isalpha())
+                else:
+                    tokens = case.lowertokens
+                fresh[i].addcase(start + j, tokens)
+        caseno[0] += len(columns[0])
+        return []
+
+    def results():
+        ncases = caseno[0]
+        result = []
+        for i in range(len(varnames)):
+            index = saved[i]
+            if index is None or changed[i] or index.ncases != ncases:
+                if index is None:
+                    index = fresh[i]
+                else:
+                    # keep the postings of the unchanged blocks
+                    index.ncases = ncases
+                    index.dropblocks(changed[i])
+                    index.merge(fresh[i])
+                index.ncases = ncases
+                index.blockhashes = hashes[i]
+                index.save(files[i])
+            result.append(indexanswers(index, ncases, words, mode, outtype))
+        return result
+
+    return Task(outnames, len(outnames) * [outtype], compute, results=results, name="SEARCH", pervariable=False)
+
+def indexanswers(index, ncases, words, mode, outtype):
+    """Return the haswords results for every case from a TextIndex
+
+    words are Word, Bigram, and Trigram objects"""
+
+    blanks = index.blankset()
+    marks = []
+    for w in words:
+        mark = bytearray(ncases)
+        for c in index.matches(w.slots):
+            mark[c] = 1
+        marks.append(mark)
+    missing = None if outtype == 0 else ""
+    if mode == "pattern":
+        digits = [mark.translate(bytes.maketrans(b"\0\1", b"01")).decode("ascii") for mark in marks]
+        return [missing if c in blanks else "".join(d[c] for d in digits) for c in range(ncases)]
+    combine = mode == "allwords" and all or any
+    return [missing if c in blanks else int(combine(mark[c] for mark in marks)) for c in range(ncases)]
+
+def freqstask(varnames, weightvar=None, stemcode=None, maxitems=None):
+    """Return a Task that accumulates the FREQUENCIES counts in runplan
+
+    After the pass, the task's counts attribute has [fd, bfd, tfd, hastextcount]
+    for each variable.  Parameters are as for freqs"""
+
+    stopwords = freqstopwords()
+    counts = [list(textaworker.makecounters(maxitems)) + [0] for v in varnames]
+
+    def compute(columns, weights):
+        for cases, vcounts in zip(columns, counts):
+            fd, bfd, tfd = vcounts[:3]
+            caseweight = 1    # unweighted
+            for i, case in enumerate(cases):
+                if len(case.text) == 0:
+                    continue
+                if weights is not None:
+                    caseweight = weights[i]
+                    if caseweight is None or caseweight <= 0:
+                        continue
+                vcounts[3] += 1
+                textaworker.countsentences(case.sentences, caseweight, fd, bfd, tfd, stemcode, stopwords)
+        return []
+
+    task = Task([], [], compute, name="FREQUENCIES", pervariable=False)
+    task.counts = counts
+    return task
 
 #*****************************************************************
 #This function takes a string variable as input and produces
@@ -210,38 +909,70 @@ except:
 #/formula "textanalysis.sentscores(comment)".
 #*****************************************************************
 
-def sentscoreslist(*vartexts):
-    
-    results = []
-    for t in vartexts:
-        results.extend(sentscores(t, m.sentimentparams['types']))
-    return results
+stdtypes = ['neg', 'neu', 'pos', 'compound']
+
+def sentkeys(types=None):
+    """return the polarity score keys for types in standard order
+
+    types is a blank-separated string or a list of types.  'comp' is
+    accepted for 'compound'.  It defaults to all four types"""
+
+    if types is None:
+        return list(stdtypes)
+    if isinstance(types, str):
+        types = types.split()
+    # map 'comp' extension to s dictionary key 'compound'
+    ttypes = ['compound' if item == 'comp' else item for item in types]
+    return [item for item in stdtypes if item in ttypes]
+
+def sentscoresbatch(columns, keys=None):
+    """return sentiment scores for a block of cases as columns
+
+    columns is a sequence of text columns, one per variable, each holding
+    one value per case.
+    keys is the list of polarity score keys to return, e.g., from sentkeys.
+    It defaults to all four.
+    The result is a list with one column per variable and key, variable-major,
+    which is the order of the output variables.  Blank text gets None for every score"""
+
+    if keys is None:
+        keys = stdtypes
+    polarity = sentimentanalyzer().polarity_scores
+    cache = sentimentcache
+    result = []
+    for texts in columns:
+        cols = [[] for k in keys]
+        appends = [col.append for col in cols]
+        for text in texts:
+            text = text.rstrip()
+            if len(text) == 0:
+                for a in appends:
+                    a(None)
+            else:
+                s = cache.get(text)
+                if s is textcache.MISSING:
+                    s = polarity(text)
+                    cache.put(text, s)
+                for a, k in zip(appends, keys):
+                    a(s[k])
+        result.extend(cols)
+    return result
+
+def sentscoreslist(*vartexts, types=None):
+    """return the sentiment scores of each text in turn
+
+    types is as for sentscores"""
+
+    keys = sentkeys(types)
+    return [col[0] for col in sentscoresbatch([[t] for t in vartexts], keys)]
 
 def sentscores(text, types=None):
     """return list of sentiment scores for string text
-    
+
     types is a list of types to return.  It defaults to
     [negative, neutral, positive, compound] in that order"""
-    
-    text = text.rstrip()
-    stdtypes = ['neg', 'neu', 'pos', 'compound']
-    if types is None:
-        ttypes= stdtypes
-    else:
-        ttypes = types.split()
-    if len(text) == 0:
-        return len(ttypes) * [None]    
-    # map 'comp' extension to s dictionary key 'compound'
-    try:
-        ttypes[ttypes.index('comp')] = 'compound'
-    except:
-        pass
-    
-    ###wordlist = nltk.word_tokenize(text)
-    ###words = [w for w in wordlist if w.isalpha()]
-    ###allwords2Cased = [w for w in words if not w.lower() in sstopwords]    
-    s = sia.polarity_scores(text)
-    return list(s[item] for item in stdtypes if item in ttypes)
+
+    return [col[0] for col in sentscoresbatch([[text]], sentkeys(types))]
 
 #*****************************************************************
 #This function takes a string variable as input and returns values indicating whether particular
@@ -267,32 +998,25 @@ def sentscores(text, types=None):
 # Find tokens in text
 # stemming not supported here
 
-from functools import lru_cache
-
-@lru_cache
+@textcache.cached("bigrams", 16 * textcache.MB)
 def bigram(textlist):
     return tuple(nltk.bigrams(textlist))
 
-@lru_cache
+@textcache.cached("trigrams", 16 * textcache.MB)
 def trigram(textlist):
     return tuple(nltk.trigrams(textlist))
 
 
 
-###def haswordslist(*varnames, words, mode='anywords', searchstem="False"):
-def haswordslist(*varnames):
-    result = []
+def haswordslist(*varnames, words, mode='anywords', searchstem=False):
+    """Return the haswords result for each text
 
-    for v in varnames:
-        result.append(haswords(v, 
-            m.haswordslistparams['words'], 
-            m.haswordslistparams['mode'], 
-            m.haswordslistparams['searchstem']))
+    words is a list of search items from STATS_TEXTANALYSIS.makesearch"""
 
-    return result
+    return [haswords(v, words, mode, searchstem) for v in varnames]
 
         
-def haswords(text, words, mode="anywords", searchstem=False):
+def haswords(text, words, mode="anywords", searchstem=False, tokens=None):
     """Return True or False for words in text
     
     text is the string to search
@@ -301,7 +1025,8 @@ def haswords(text, words, mode="anywords", searchstem=False):
         "pattern" - return a string of 1's and 0's
         "allwords" - return True if has all words in words
         "anywords" - return True if any of the words appear
-    searchstem specifies whether words in the text should be stemmed before searching"""
+    searchstem specifies whether words in the text should be stemmed before searching
+    tokens is the tuple of lower case tokens of text if already available"""
     ###from STATS_TEXTANALYSIS import Word, Bigram, Trigram
     
     # The stemmer object is passed behind the scenes.
@@ -309,7 +1034,9 @@ def haswords(text, words, mode="anywords", searchstem=False):
     
     if len(text.rstrip()) == 0:
         return ""
-    textlist = tuple(nltk.word_tokenize(text.lower()))
+    if tokens is None:
+        tokens = tuple(wordtokens(text.lower()))
+    textlist = tokens
     if searchstem:
         textlist = tuple(stemcode(w) for w in textlist if w.isalpha())
     if not spssaux._isseq(words):   #???
@@ -334,19 +1061,71 @@ def haswords(text, words, mode="anywords", searchstem=False):
     #else:
         #return scanlist
 
+# The stems of words are kept in one table per stemmer language, which is shared by
+# STEMS, FREQUENCIES with STEM, and SEARCH with STEM.  The tables can be saved in the cache
+# directory, so they fill up across sessions.
+
+STEMS_VERSION = 1
+stemsloaded = set()    # languages whose saved table has been loaded in this session
+
+def stemfile(stemmerlang):
+    return os.path.join(cachedir(), "stems-{0}.dat".format(stemmerlang))
+
+def stemcache(stemmerlang, load=False):
+    """Return the stem table for stemmerlang, first adding the saved stems if load and not done yet"""
+
+    cache = textcache.getcache("stems " + stemmerlang, 8 * textcache.MB)
+    if load and stemmerlang not in stemsloaded:
+        stemsloaded.add(stemmerlang)
+        # a new nltk version might stem differently
+        cache.load(stemfile(stemmerlang), (STEMS_VERSION, nltk.__version__, stemmerlang))
+    return cache
+
+def stemtable(stemmerlang):
+    """Return a dictionary of the known stems for stemmerlang"""
+
+    return dict(stemcache(stemmerlang).data)
+
+def savestems():
+    """Save the stem tables that have new entries"""
+
+    for stemmerlang in stemsloaded:
+        cache = stemcache(stemmerlang)
+        if cache.changed:
+            cache.save(stemfile(stemmerlang), (STEMS_VERSION, nltk.__version__, stemmerlang))
+
+def cachedstemmer(stemmerlang, load=False):
+    """Return a Snowball stemming function for stemmerlang that caches the stems of words
+
+    load specifies whether to add the saved stems to the table"""
+
+    stem = nltk.SnowballStemmer(stemmerlang).stem
+    cache = stemcache(stemmerlang, load)
+
+    def stemcode(word):
+        result = cache.get(word)
+        if result is textcache.MISSING:
+            result = stem(word)
+            cache.put(word, result)
+        return result
+    return stemcode
+
 def stems(*texts):
     """return list of stemmed text for texts"""
     
+    return [stemtext(v) for v in texts]
+
+def stemtext(text, tokens=None):
+    """return the stemmed words of text separated by blanks
+
+    tokens is the sequence of lower case tokens of text if already available"""
+
+    if len(text.rstrip()) == 0:
+        return ""
+    if tokens is None:
+        tokens = wordtokens(text.lower())
     stemcode = m.stemmergg
-    result = []
-    for v in texts:
-        if len(v.rstrip()) == 0:
-            result.append("")
-        else:
-            textlist = nltk.word_tokenize(v.lower())
-            textlist = [stemcode(w) for w in textlist]
-            result.append(" ".join(textlist))
-    return result
+    return " ".join([stemcode(w) for w in tokens])
 
 # get chunks for Named Entities
 #def get_continuous_chunks(text, netype, binary=True):
@@ -386,34 +1165,19 @@ def stems(*texts):
 
     #return continuous_chunk
 
-def get_continuous_chunks(text, netype, binary=True):
+def get_continuous_chunks(text, netype, binary=True, tokens=None):
     """Return list of Named Entities found in text
     
     text is the text to search
     netype is the entity type, which can be "all" or a specific type
-    binary is True or False for chunking"""
-    
-    
-    chunked = nltk.ne_chunk(nltk.pos_tag(nltk.word_tokenize(text)), binary)
-    chunked.append("<DONE>")    # make sure to get the last tree
-    continuous_chunk = []
-    current_chunk = []
-    ctype = None
-
-    for i in chunked:
-        if type(i) == nltk.Tree:
-            if ctype is None:
-                ctype = i.label()[:3]
-            current_chunk.append(" ".join([token for token, pos in i.leaves()]))
-        elif current_chunk:
-            named_entity = "<" + ctype + ">" +" ".join(current_chunk)
-            if named_entity not in continuous_chunk:
-                continuous_chunk.append(named_entity)
-            current_chunk = []
-            ctype = None
-    return continuous_chunk
+    binary is True or False for chunking
+    tokens is the wordtokens list for text if already available"""
+    
+    if tokens is None:
+        tokens = wordtokens(text)
+    return textaworker.entitychunks(nltk.ne_chunk(nltk.pos_tag(tokens), binary))
     
-def hasneslist(*text):
+def hasneslist(*text, etype="alltypes"):
     """Evaluate text for named entities
     
             ctype = None
@@ -424,32 +1188,135 @@ def hasneslist(*text):
         #named_entity = "<" + ctype + ">" + " ".join(current_chunk)
         #if named_entity not in continuous_chunk:
             #continuous_chunk.append(named_entity)
-    args is a list of variables"""
+    args is a list of variables
+    etype is the entity type to look for or alltypes"""
     
-    result = []
+    ecompiled = entitypattern(etype)
+    return [hasnes(t, etype, ecompiled) for t in text]
+
+def entitypattern(etype):
+    """Return the compiled pattern for entities of type etype or None for alltypes"""
 
-    for t in text:
-        result.append(hasnes(t, 
-            m.hasentitylistparams["etype"], m.hasentitylistparams["regexp"]))
-    return result    
+    if etype.lower() == "alltypes":
+        return None
+    return re.compile("<" + etype.upper()[:3] + ">")
     
     
-def hasnes(text, etype, ecompiled):
+def hasnes(text, etype, ecompiled, tokens=None):
     """return list of entities found
     
-    etype is the entity type to look for"""
+    etype is the entity type to look for
+    tokens is the wordtokens list for text if already available"""
     
     # binary choice not yet implemented
     
     if len(text.rstrip()) == 0:
         return ""    
     
-    allent = get_continuous_chunks(text, etype, binary=False)
+    allent = get_continuous_chunks(text, etype, binary=False, tokens=tokens)
+    return entitystring(allent, etype, ecompiled)
+
+def entitystring(allent, etype, ecompiled):
+    """Return the entities in list allent that match etype separated by /"""
+
     if etype == "alltypes":
         return "/".join(item for item in allent if len(item) > 0)
     else:
         return "/".join(item for item in allent if len(item) > 0 and re.match(ecompiled, item) is not None)
 
+# entity lists by text
+entitycache = textcache.getcache("entities", 16 * textcache.MB)
+
+def mayhaveentities(tokens):
+    """Return whether any token starts with a capital letter
+
+    The named entity chunker relies heavily on capitalization, so text without
+    any capitals is treated as having no entities.  This is the same for every
+    entity type, and the chunker can find entities in lowercase text"""
+
+    return any(t[:1].isupper() for t in tokens)
+
+def hasnesbatch(columns, etype, ecompiled, pool=None, processes=1, prefilter=False, counts=None):
+    """Return the hasnes results for blocks of cases as columns
+
+    columns is a sequence of lists of CaseText, one per variable
+    pool is a process pool from makepool or None to do the work here
+    processes is the number of processes in the pool.
+    prefilter specifies whether to skip texts for which mayhaveentities is False
+    counts is None or a dictionary whose "text", "memo", "prefiltered", and "chunked"
+    entries are incremented by the numbers of cases with text, found in the memo
+    or repeated in the block, skipped by the prefilter, and tagged and chunked.
+    The memo is checked before the text is tokenized.
+    The other cases of all the columns are tagged and chunked in batches, which
+    are divided among the pool processes.  The results are in case order
+    and, apart from the prefilter, are the same as from hasnes"""
+
+    if counts is None:
+        counts = dict.fromkeys(["text", "prefiltered", "memo", "chunked"], 0)
+    keys = []    # for each case, the memo key or None
+    entities = {}    # entities by key for this block
+    pending = {}    # tokens by key for the texts to be chunked
+    for col in columns:
+        for case in col:
+            if len(case.text) == 0:
+                keys.append(None)
+                continue
+            counts["text"] += 1
+            # the entities depend on the tokens
+            key = (case.text, tokenizer)
+            keys.append(key)
+            if key in entities or key in pending:
+                counts["memo"] += 1
+                continue
+            found = entitycache.get(key)
+            if found is not textcache.MISSING:
+                counts["memo"] += 1
+                entities[key] = found
+                continue
+            tokens = case.tokens
+            if prefilter and not mayhaveentities(tokens):
+                # remembered as having no entities only for this block, since the prefilter may be off later
+                counts["prefiltered"] += 1
+                entities[key] = []
+                continue
+            pending[key] = tokens
+    if pending:
+        counts["chunked"] += len(pending)
+        tokenlists = list(pending.values())
+        if pool is None:
+            found = textaworker.entitiesbatch(tokenlists)
+        else:
+            # several batches per process balance the load
+            size = max(1, -(-len(tokenlists) // (4 * processes)))
+            batches = [tokenlists[i:i+size] for i in range(0, len(tokenlists), size)]
+            found = [item for batch in pool.map(textaworker.entitiesbatch, batches) for item in batch]
+        for key, ents in zip(pending, found):
+            entitycache.put(key, ents)
+            entities[key] = ents
+    keys = iter(keys)
+    result = []
+    for col in columns:
+        result.append([])
+        for case in col:
+            key = next(keys)
+            result[-1].append("" if key is None else entitystring(entities[key], etype, ecompiled))
+    return result
+
+def entityreport(counts, prefilter):
+    """Display how many cases were skipped, found in the memo, or tagged and chunked
+
+    counts is the dictionary accumulated by hasnesbatch"""
+
+    spss.StartProcedure("Text Analysis")
+    if prefilter:
+        spss.AddProcedureFootnotes(_("Text with no capitalized words was not searched, so entities of any type in it may be missed"))
+    pt = spss.BasePivotTable(_("Named Entity Search"), "EntitySearch")
+    pt.SimplePivotTable(rowlabels=[_("Cases with Text"), _("Found in Memo"), _("Skipped by Prefilter"),
+            _("Tagged and Chunked")],
+        collabels=[_("Count")],
+        cells=[counts["text"], counts["memo"], counts["prefiltered"], counts["chunked"]])
+    spss.EndProcedure()
+
     
 # ********************************************************************    
 # This function creates an SPSS dataset containing the words and Vader
@@ -466,22 +1333,75 @@ def createLexiconDataset(name="lexicon"):
     activeds = spss.ActiveDataset()
     if activeds == "*":
         raise ValueError("""Stopping.  The active dataset is unnamed.""")
-    curs = spssdata.Spssdata(accessType='n')
-    curs.append(spssdata.vdef("word", 30))
-    curs.append(spssdata.vdef("score", 0))
-    curs.commitdict()
-    
-    for item in sia.lexicon.items():
-        curs.appendvalue('word', item[0])
-        curs.appendvalue('score', item[1])
-        curs.CommitCase()
-    curs.CClose()
+    wordsdataset(name, activeds, ["word", "score"], [False, True], sentimentanalyzer().lexicon.items())
+
+def wordsdataset(name, activeds, varnames, numeric, rows):
+    """Create dataset name from rows and then activate dataset activeds
+
+    varnames is the list of variable names
+    numeric is a list of True for numeric variables and False for strings
+    rows is an iterable of value sequences
+    The rows are written to a temporary file and read with a single GET DATA,
+    which is much faster than adding the cases one at a time through a cursor.
+    Each string variable is as wide as its longest value in bytes, and each numeric
+    format is wide enough for the longest value with all its decimals"""
+
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        # GET DATA can't read an empty file, so the empty dataset is defined with a cursor
+        curs = spssdata.Spssdata(accessType='n')
+        for v, isnum in zip(varnames, numeric):
+            curs.append(spssdata.vdef(v, isnum and 0 or 1))
+        curs.commitdict()
+        curs.CClose()
+        spss.Submit(f"""DATASET NAME {name}.""")
+    else:
+        getwords(name, varnames, numeric, itertools.chain([first], rows))
     # can't reactivate an empty active dataset
     try:
-        spss.Submit(f"""DATASET NAME {name}.
-DATASET ACTIVATE {activeds}.""")
+        spss.Submit(f"""DATASET ACTIVATE {activeds}.""")
     except:
         pass
+
+def getwords(name, varnames, numeric, rows):
+    """Write rows to a temporary file and read it as dataset name with GET DATA
+
+    The arguments are as for wordsdataset"""
+
+    widths = [0] * len(varnames)
+    decimals = [0] * len(varnames)
+    fd, filespec = tempfile.mkstemp(suffix=".txt", prefix="textanalysis")
+    try:
+        with open(fd, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f, delimiter="\t", lineterminator="\n")
+            for row in rows:
+                values = [repr(float(v)) if isnum else v for v, isnum in zip(row, numeric)]
+                for i, value in enumerate(values):
+                    if not numeric[i]:
+                        widths[i] = max(widths[i], len(value.encode("utf-8")))
+                        continue
+                    widths[i] = max(widths[i], len(value))
+                    if "." in value and "e" not in value:
+                        decimals[i] = max(decimals[i], len(value) - value.index(".") - 1)
+                writer.writerow(values)
+        specs = " ".join("{0} {1}".format(v, isnum and "F{0}.{1}".format(max(w, 8), min(d, 16))
+            or "A{0}".format(max(w, 1))) for v, isnum, w, d in zip(varnames, numeric, widths, decimals))
+        # the file always uses . for decimals
+        spss.Submit(f"""PRESERVE.
+SET DECIMAL=DOT.
+GET DATA /TYPE=TXT /FILE='{filespec.replace("'", "''")}' /ENCODING='UTF8'
+  /ARRANGEMENT=DELIMITED /DELCASE=LINE /FIRSTCASE=1 /DELIMITERS="\\t" /QUALIFIER='"'
+  /VARIABLES={specs}.
+CACHE.
+EXECUTE.
+RESTORE.
+DATASET NAME {name}.""")
+    finally:
+        try:
+            os.remove(filespec)
+        except OSError:
+            pass
     
 # ********************************************************************
 # This function adds words with scores or changes existing scores
@@ -515,6 +1435,7 @@ def addSentimentScores(filespec, suppencoding):
         return
     
     filespec = spssaux.FileHandles().resolve(filespec)
+    sia = sentimentanalyzer()
     wordcount = 0
     badcount = 0
     with open(filespec, encoding=suppencoding) as f:
@@ -530,6 +1451,7 @@ def addSentimentScores(filespec, suppencoding):
             else:
                 sia.lexicon[word.lower()] = score
                 wordcount += 1
+    sentimentcache.clear()
     print ("*** words added to lexicon from {0}: {1}".format(filespec, wordcount))
     if badcount > 0:
         print(f"*** Badlines: {badcount}")
@@ -540,11 +1462,13 @@ def addNegationTerms(filespec, suppencoding):
     if filespec is None:
         return
     filespec = spssaux.FileHandles().resolve(filespec)
+    sia = sentimentanalyzer()
     wordcount = 0
     with open(filespec, encoding=suppencoding) as f:    #1/8/2023
         for line in f:
             sia.constants.NEGATE.add(line.replace("\n", "").lower())   # stripping \n if present
             wordcount += 1    
+    sentimentcache.clear()
     print(f"Negative terms processed: {wordcount}")
     
 def addEmphasisTerms(filespec, suppencoding):
@@ -553,6 +1477,7 @@ def addEmphasisTerms(filespec, suppencoding):
     if filespec is None:
         return
     filespec = spssaux.FileHandles().resolve(filespec)
+    sia = sentimentanalyzer()
     wordcount = 0
     badcount = 0
     with open(filespec, encoding=suppencoding) as f:  # 1/8/2023
@@ -567,6 +1492,7 @@ def addEmphasisTerms(filespec, suppencoding):
             else:
                 sia.constants.BOOSTER_DICT[word.lower()] = score
                 wordcount += 1    
+    sentimentcache.clear()
     print(f"Emphasis terms processed: {wordcount}")
     if badcount > 0:
         print(f"Bad emphasis terms: {badcount}")
@@ -589,47 +1515,34 @@ def createSpecialDatasets(names):
     activeds = spss.ActiveDataset()
     if activeds == "*" and any(names):
         raise ValueError("""The active dataset must have a name to create negative or emphasis dataset.""")
+    sia = sentimentanalyzer()
     
     if names[0]:         # negate terms dataset
-        curs = spssdata.Spssdata(accessType='n')
-        curs.append(spssdata.vdef("negativeWord", 30))
-        curs.commitdict()
-        
-        for item in sorted(sia.constants.NEGATE):
-            curs.appendvalue('negativeWord', item)
-            curs.CommitCase()
-        curs.CClose()
-        # if the active dataset is empty as on startup, it can't be re-activated
-        try:
-            spss.Submit(f"""DATASET NAME {names[0]}.
-DATASET ACTIVATE {activeds}.""")
-        except:
-            pass
+        wordsdataset(names[0], activeds, ["negativeWord"], [False], ([item] for item in sorted(sia.constants.NEGATE)))
     
     if names[1]:  # emphasis terms dataset
-        curs = spssdata.Spssdata(accessType='n')
-        curs.append(spssdata.vdef("emphasisWord", 30))
-        curs.append(spssdata.vdef("score", 0))
-        curs.commitdict()        
-        for item in sorted(sia.constants.BOOSTER_DICT.items()):
-            curs.appendvalue('emphasisWord', item[0])
-            curs.appendvalue('score', item[1])
-            curs.CommitCase()        
-        curs.CClose()
-        spss.Submit(f"""DATASET NAME {names[1]}.
-DATASET ACTIVATE {activeds}.""")
+        wordsdataset(names[1], activeds, ["emphasisWord", "score"], [False, True],
+            sorted(sia.constants.BOOSTER_DICT.items()))
         
     
 extraspelldict = []
+extrafingerprints = {}    # content fingerprints of the extra dictionaries by file
 spell = None
 dictlang = None
-names = set(nltk.corpus.names.words())
-try:
-    import spellchecker
-    ###spell = spellchecker.SpellChecker(language=None, case_sensitive=False)
-except:
-    print("""The spellcorrection function requires the spellchecker module.  Install as pip install spellchecker.""")
-    raise
+spellmemo = None
+speller = None    # the object whose correction method is used: spell or a symspell.SymSpell
+symspellers = {}  # SymSpell objects by dictionary key
+names = None      # the set of names from nltk, loaded by propernames
+
+def propernames():
+    """Return the set of names, loading it on first use"""
+
+    global names
+    if names is None:
+        start = time.perf_counter()
+        names = set(nltk.corpus.names.words())
+        m.recordload("names", start)
+    return names
 
 # ********************************************************************
 # This function accepts a list of variable names and corrects spelling
@@ -651,10 +1564,20 @@ except:
 # A corpus of text where the words are spelled correctly can also be used,
 # and frequency weights will be based on that.
 
-###def spellcorrection(*args, excludenames=True, excludestopwords=False, extradict=None, language="en"):
-
-@lru_cache(maxsize=2048)
 def cachedcorrection(spell, w):
+    """Return the correction of word w from the spelling cache, adding it if new
+
+    spell is the object whose correction method is used"""
+
+    outword = spellmemo.get(w)
+    if outword is None:
+        outword = wordcorrection(spell, w)
+        spellmemo.put(w, outword)
+    return outword
+
+def wordcorrection(spell, w):
+    """Return the correction of word w"""
+
     wr = w.rstrip()
     if len(wr) <= 1:         # or wr[0] in ['.', ',', ';', ':', '!', '?']:
         outword = w
@@ -665,59 +1588,145 @@ def cachedcorrection(spell, w):
         # Corrections always come back in lower case
 
         outword = spell.correction(w)
+        if outword is None:    # no candidates
+            return w
         if outword[0] == wlower[0]:
             outword = w[0] + outword[1:]    
     return outword
     
-def spellcorrection(*args):
+def spellcorrection(*args, excludenames=True, extradict="", language="en", stopwords=frozenset()):
     """Check spelling of each arg value and return corrected text
     
-    excludenames specifies whether names are checked"""
+    excludenames specifies whether names are checked
+    extradict is the file of extra words or ""
+    language is the spell checker language code
+    stopwords is a set of words that are not checked"""
     
+    spellsetup(language, extradict)
+    return [correcttext(v, excludenames, stopwords) for v in args]
 
-    global extraspelldict, spell, dictlang
-    
-    excludenames = m.spellcorrectionparams['excludenames']
-    extradict = m.spellcorrectionparams['extradict']
-    language = m.spellcorrectionparams['language']
-    stopwords = m.spellcorrectionparams['stopwords']
-    
+def spellsetup(language, extradict="", cachesize=0, engine="pyspellchecker"):
+    """Make the spell checker ready for language with any extra dictionary loaded
+
+    extradict is the file of extra words or ""
+    cachesize is the maximum number of corrections to keep in the persistent
+    cache or 0 to cache corrections only for the session
+    engine is "pyspellchecker" or "symspell" for the symmetric delete index"""
+
+    global extraspelldict, spell, dictlang, spellmemo, speller
+
+    start = time.perf_counter()
+    try:
+        import spellchecker
+    except ImportError:
+        raise ValueError(_("Spelling correction requires the pyspellchecker module.  Install it with pip install pyspellchecker."))
+    m.recordload("spellchecker", start)
     if spell is None or language != dictlang:
         spell = spellchecker.SpellChecker(language=language, case_sensitive=False)
         dictlang = language
+        # a new spell checker has none of the extra dictionaries
+        extraspelldict = []
     
     if extradict != "":
         extradictx = spssaux.FileHandles().resolve(extradict)
         if not extradictx in extraspelldict:
             print("""Loading supplemental spell dictionary: {0}.
             It will be used for the duration of this session.""".format(extradictx))
+            # the words are counted as load_text_file would count them, but only when the file changes
             try:
-                spell.word_frequency.load_text_file(extradictx)
-                extraspelldict.append(extradictx)
-            except:
+                counts, fingerprint = spellcache.wordcounts(extradictx, spellcache.snapshotfile(cachedir(), extradictx),
+                    spellchecker.__version__, countwords)
+            except (OSError, ValueError):
                 raise ValueError(_("Extra spelling dictionary not found: {0}").format(extradictx))
+            spell.word_frequency.load_json(counts)
+            extraspelldict.append(extradictx)
+            extrafingerprints[extradictx] = fingerprint
     
-    vout = []  # for corrected list for each variable checked
-    for v in args:
-        v = v.rstrip() + ' '   # always need a terminator
-        if len(v) <= 1:        # spell check "corrects" empty string to "i"
-            vout.append('')
-            continue
+    # corrections depend on the language, the spell checker version, and the extra dictionaries
+    dictkey = "/".join([language, spellchecker.__version__] +
+        sorted(extrafingerprints[f] for f in extraspelldict))
+    if engine == "symspell":
+        speller = symspeller(dictkey)
+    else:
+        speller = spell
+    # the engines can break frequency ties differently, so they are cached separately
+    memokey = dictkey + "/" + engine
+    path = cachesize > 0 and os.path.join(cachedir(), spellcache.SPELLCACHE_NAME) or None
+    if spellmemo is None or spellmemo.dictkey != memokey or spellmemo.path != path:
+        spellflush()
+        spellmemo = spellcache.SpellCache(path, memokey, cachesize)
+    spellmemo.maxentries = cachesize
 
-        outwords = []
-        vs = re.split("([ ,\.]+)", v)   # includes split character in list, hence the append below
-        for i, w in enumerate(vs):
-            if i % 2 == 0:    # the word
-                if len(w) == 0:
-                    continue
-                wl = w.lower()
-                if wl in stopwords or (excludenames and wl in names):
-                    outwords.append(w + vs[i+1])
-                    continue                
-                outword = cachedcorrection(spell, w)
-                outwords.append(outword + vs[i+1])
-        vout.append("".join(outwords))
-    return vout
+def countwords(filespec):
+    """Return a dictionary of the counts of the words in the text file filespec as pyspellchecker counts them"""
+
+    import spellchecker
+    wf = spellchecker.WordFrequency()
+    wf.load_text_file(filespec)
+    return dict(wf.dictionary)
+
+def symspeller(dictkey):
+    """Return the SymSpell object for the current spell checker dictionary
+
+    dictkey identifies the dictionary set.  The index is built once per dictionary set
+    and saved in the cache directory for later sessions"""
+
+    if dictkey not in symspellers:
+        ss = symspell.SymSpell(spell.word_frequency)
+        indexfile = os.path.join(cachedir(),
+            "symspell-{0}.idx".format(hashlib.sha1(dictkey.encode("utf-8")).hexdigest()))
+        if not ss.load(indexfile, dictkey):
+            print(_("Building the spelling index for {0}.  It will be saved for later sessions.").format(dictlang))
+            ss.build()
+            ss.save(indexfile, dictkey)
+        symspellers[dictkey] = ss
+    return symspellers[dictkey]
+
+def spellflush():
+    """Save new spelling corrections in the persistent cache"""
+
+    if spellmemo is not None:
+        spellmemo.flush()
+
+def spellreport():
+    """Save new spelling corrections and display the cache statistics"""
+
+    spellflush()
+    spss.StartProcedure("Text Analysis")
+    pt = spss.BasePivotTable(_("Spelling Correction Cache"), "SpellingCache")
+    if spellmemo.path is not None:
+        spss.AddProcedureFootnotes(_("Cache file: {0}").format(spellmemo.path))
+    else:
+        spss.AddProcedureFootnotes(_("Corrections are cached for this session only"))
+    labels, counts = zip(*spellmemo.stats())
+    pt.SimplePivotTable(rowlabels=[_(label) for label in labels], collabels=[_("Count")], cells=counts)
+    spss.EndProcedure()
+
+def correcttext(v, excludenames, stopwords):
+    """Return text v with the spelling corrected
+
+    spellsetup must have been called first
+    excludenames specifies whether names are left alone
+    stopwords is the set of words to leave alone"""
+
+    v = v.rstrip() + ' '   # always need a terminator
+    if len(v) <= 1:        # spell check "corrects" empty string to "i"
+        return ''
+
+    outwords = []
+    names = excludenames and propernames() or ()
+    vs = re.split("([ ,\.]+)", v)   # includes split character in list, hence the append below
+    for i, w in enumerate(vs):
+        if i % 2 == 0:    # the word
+            if len(w) == 0:
+                continue
+            wl = w.lower()
+            if wl in stopwords or wl in names:
+                outwords.append(w + vs[i+1])
+                continue                
+            outword = cachedcorrection(speller, w)
+            outwords.append(outword + vs[i+1])
+    return "".join(outwords)
                 
         
         
@@ -0,0 +1,260 @@
+# text analysis functions that can run in worker processes
+
+# Author: Jon K Peck
+# History
+# 18-oct-2026 Initial version: word and n-gram counting for FREQUENCIES
+# 18-oct-2026 Bounded-memory approximate counts
+# 18-oct-2026 Count from already tokenized sentences
+# 18-oct-2026 Batched named entity tagging and chunking for ENTITYSEARCH
+# 18-oct-2026 Start worker stemming from the stem table of the main process
+# 18-oct-2026 Regular expression tokenizer as an alternative to nltk
+
+# The functions here are used both by texta in the Statistics process and by
+# the worker processes of a multiprocessing pool.  Worker processes run
+# outside of Statistics, so this module must not import spss, spssdata, spssaux,
+# or the other extension modules, and all the settings a worker needs
+# are passed to it explicitly.
+
+import nltk, re
+from collections import Counter
+
+# The regular expression tokenizer approximates the nltk Treebank tokens in a
+# single pass: contractions are split as Treebank does, hyphenated words,
+# abbreviations such as U.S., and numbers such as 3.5 are kept whole, and every
+# other punctuation character is a token.  Sentences end after . ! or ?
+# instead of being found by the Punkt model, so abbreviations can end a sentence.
+TOKENPATTERN = re.compile(r"""
+    (?:[^\W\d_]\.){2,}    # abbreviations
+    | \d+(?:[.,:]\d+)+    # numbers with separators
+    | \w+(?=n't\b)    # the word before n't
+    | n't\b
+    | '(?:s|m|d|ll|re|ve)\b
+    | \w+(?:-\w+|'(?!(?:s|m|d|ll|re|ve|t)\b)\w+)*    # words, including hyphenated words and o'clock
+    | \.\.\.|--
+    | [^\w\s]""", re.VERBOSE | re.IGNORECASE)
+SENTENCEENDS = frozenset([".", "!", "?"])
+
+def nltksentences(text):
+    """Return the list of word_tokenize token lists, one per sentence, of text"""
+
+    return [nltk.word_tokenize(s, preserve_line=True) for s in nltk.tokenize.sent_tokenize(text)]
+
+def regexsentences(text):
+    """Return the list of token lists, one per sentence, of text from the regular expression tokenizer"""
+
+    sentences = []
+    current = []
+    for token in TOKENPATTERN.findall(text):
+        if current and current[-1] in SENTENCEENDS and token not in SENTENCEENDS:
+            sentences.append(current)
+            current = []
+        current.append(token)
+    if current:
+        sentences.append(current)
+    return sentences
+
+# the sentence tokenizers by the TOKENIZER keyword value
+TOKENIZERS = {"nltk": nltksentences, "regex": regexsentences}
+
+def addcounts(counter, items, weight=1):
+    """Add the items to counter with weight for each occurrence
+
+    counter is a Counter or FrequentItems
+    items is an iterable of words or n-grams
+    weight is the case weight, which need not be an integer"""
+
+    if weight == 1:
+        counter.update(items)
+    else:
+        for item in items:
+            counter[item] += weight
+        if isinstance(counter, FrequentItems):
+            counter.prune()
+
+class FrequentItems(Counter):
+    """Approximate counts of the most frequent items in bounded memory
+
+    This is the weighted Misra-Gries frequent items summary.  When more than
+    2 * capacity items are held, the (capacity+1)th largest count is
+    subtracted from every count, and items that drop to zero or below are discarded.
+    decrement accumulates the amounts subtracted, so for every item
+    count <= true count <= count + decrement, and decrement is at most
+    total weight / (capacity + 1).  An item whose true count is more than
+    decrement is always retained.
+    Summaries are mergeable: updating with another FrequentItems adds its
+    counts and decrement, and the result has the same guarantee"""
+
+    def __init__(self, capacity):
+        # set before Counter.__init__, which calls update
+        self.capacity = capacity
+        self.decrement = 0
+        super().__init__()
+
+    def update(self, iterable=None, **kwds):
+        super().update(iterable, **kwds)
+        if isinstance(iterable, FrequentItems):
+            self.decrement += iterable.decrement
+        self.prune()
+
+    def prune(self):
+        """Cut back to capacity items if more than twice that are held"""
+
+        if len(self) <= 2 * self.capacity:
+            return
+        threshold = sorted(self.values(), reverse=True)[self.capacity]
+        self.decrement += threshold
+        for item, count in list(self.items()):
+            if count <= threshold:
+                del self[item]
+            else:
+                self[item] = count - threshold
+
+    def __reduce__(self):
+        # Counter pickles as its class called with the item dict, which does not fit __init__
+        return (restorefrequent, (self.capacity, dict(self), self.decrement))
+
+def restorefrequent(capacity, counts, decrement):
+    """Return a FrequentItems object from its pickled parts"""
+
+    result = FrequentItems(capacity)
+    dict.update(result, counts)
+    result.decrement = decrement
+    return result
+
+def makecounters(capacity=None):
+    """Return word, bigram, and trigram counters
+
+    capacity is None for exact Counters or the number of items for FrequentItems"""
+
+    if capacity:
+        return FrequentItems(capacity), FrequentItems(capacity), FrequentItems(capacity)
+    return Counter(), Counter(), Counter()
+
+def countcase(text, weight, fd, bfd, tfd, stemcode=None, stopwords=frozenset(), tokenizer="nltk"):
+    """Add the words, bigrams, and trigrams in text to the counters
+
+    text is the stripped, nonblank text of a case
+    weight is the case weight
+    fd, bfd, and tfd are the word, bigram, and trigram Counters
+    stemcode is the stemming function or None
+    stopwords is the set of words to ignore
+    tokenizer is the TOKENIZERS key of the tokenizer to use"""
+
+    sentences = TOKENIZERS[tokenizer](text)
+    countsentences(sentences, weight, fd, bfd, tfd, stemcode, stopwords)
+
+def countsentences(sentences, weight, fd, bfd, tfd, stemcode=None, stopwords=frozenset()):
+    """Add the words, bigrams, and trigrams in the tokenized sentences of a case to the counters
+
+    sentences is a list of token lists, one per sentence.  Other parameters are as for countcase"""
+
+    # treat each sentence separately
+    for s in sentences:
+        wordlist = [w.lower() for w in s]
+        if stemcode:
+            words = [stemcode(w) for w in wordlist if w.isalpha()]
+        else:
+            words = [w for w in wordlist if w.isalpha()]
+        if stopwords:
+            words = [w for w in words if not w in stopwords]
+        addcounts(fd, words, weight)
+        # don't add an n-gram unless its elements are unique
+        addcounts(bfd, (w for w in nltk.bigrams(words) if len(set(w)) == len(w)), weight)
+        addcounts(tfd, (w for w in nltk.trigrams(words) if len(set(w)) == len(w)), weight)
+
+def countcases(cases, weighted, fd, bfd, tfd, stemcode=None, stopwords=frozenset(), tokenizer="nltk"):
+    """Count the words and n-grams in a sequence of cases and return the number with text
+
+    cases is a sequence of (text,) or, if weighted, (text, weight) tuples
+    Cases with blank text or a missing or nonpositive weight are skipped
+    as in other procedures"""
+
+    hastextcount = 0
+    caseweight = 1    # unweighted
+    for case in cases:
+        t = case[0].rstrip()
+        if len(t) == 0:
+            continue
+        if weighted:
+            caseweight = case[1]
+            if caseweight is None or caseweight <= 0:
+                continue
+        hastextcount += 1
+        countcase(t, caseweight, fd, bfd, tfd, stemcode, stopwords, tokenizer)
+    return hastextcount
+
+# worker process state set by initcounts
+workerstem = None
+workerstopwords = frozenset()
+workercapacity = None
+workertokenizer = "nltk"
+
+def initcounts(stemmerlang, stopwords, capacity=None, stems=None, tokenizer="nltk"):
+    """Pool initializer for countchunk
+
+    stemmerlang is the Snowball stemmer language or None for no stemming
+    stopwords is the set of words to ignore
+    capacity is None for exact counts or the FrequentItems capacity
+    stems is a dictionary of words and their stems already known
+    tokenizer is the TOKENIZERS key of the tokenizer to use"""
+
+    global workerstem, workerstopwords, workercapacity, workertokenizer
+    if stemmerlang:
+        stem = nltk.SnowballStemmer(stemmerlang).stem
+        table = dict(stems or {})
+
+        def workerstem(word):
+            result = table.get(word)
+            if result is None:
+                result = table[word] = stem(word)
+            return result
+    else:
+        workerstem = None
+    workerstopwords = stopwords
+    workercapacity = capacity
+    workertokenizer = tokenizer
+
+def entitychunks(chunked):
+    """Return the list of distinct named entities in a tree from ne_chunk
+
+    Each entity is its words preceded by the first three letters of its type in <>,
+    and adjacent entities are combined under the type of the first"""
+
+    chunked.append("<DONE>")    # make sure to get the last tree
+    continuous_chunk = []
+    current_chunk = []
+    ctype = None
+
+    for i in chunked:
+        if type(i) == nltk.Tree:
+            if ctype is None:
+                ctype = i.label()[:3]
+            current_chunk.append(" ".join([token for token, pos in i.leaves()]))
+        elif current_chunk:
+            named_entity = "<" + ctype + ">" +" ".join(current_chunk)
+            if named_entity not in continuous_chunk:
+                continuous_chunk.append(named_entity)
+            current_chunk = []
+            ctype = None
+    return continuous_chunk
+
+def entitiesbatch(tokenlists, binary=False):
+    """Return the lists of named entities for a batch of cases
+
+    tokenlists has the word_tokenize list of each case.  As with pos_tag
+    and ne_chunk, each case is tagged and chunked as a unit, but the batch
+    is done with the sentence-batched functions, which set up the tagger
+    and chunker once"""
+
+    tagged = nltk.pos_tag_sents(tokenlists)
+    return [entitychunks(tree) for tree in nltk.ne_chunk_sents(tagged, binary)]
+
+def countchunk(cases, weighted):
+    """Return word, bigram, and trigram Counters and the text case count for a chunk of cases
+
+    The Counters from successive chunks can be merged in chunk order with update to
+    get the same counts and first-occurrence order as counting all the cases at once"""
+
+    fd, bfd, tfd = makecounters(workercapacity)
+    hastextcount = countcases(cases, weighted, fd, bfd, tfd, workerstem, workerstopwords, workertokenizer)
+    return fd, bfd, tfd, hastextcount
@@ -0,0 +1,207 @@
+# bounded in-memory caches with use statistics
+
+# Author: Jon K Peck
+# History
+# 18-oct-2026 Initial version
+# 18-oct-2026 Save and load cache entries
+# 18-oct-2026 Total hits for the timing report
+# 18-oct-2026 A cleared cache is not saved over its file
+
+# The helper functions in texta cache results such as n-grams, stems, and
+# sentiment scores.  Each cache here has a memory budget in bytes, and when
+# adding an entry would exceed the budget, the least recently used entries
+# are evicted.  Sizes are estimates from sys.getsizeof of the key and value
+# and their elements plus a fixed overhead per entry.  Hits, misses, and
+# evictions are counted so that the use of each cache can be reported.
+# The caches live for the Statistics session, so entries are reused by
+# later commands, but the counts are reset by resetstats.  A cache whose keys
+# and values are simple types can also be saved in a file for later sessions.
+# This module does not use spss, so it can be used outside of Statistics.
+
+import sys, os, marshal
+from collections import OrderedDict
+
+MB = 1 << 20
+ENTRYOVERHEAD = 100    # approximate bytes for the dictionary slot and links of an entry
+MISSING = object()    # get result for a key not in the cache
+
+def approxsize(obj):
+    """Return the approximate memory size of obj in bytes including its elements"""
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (tuple, list, set, frozenset)):
+        size += sum(approxsize(x) for x in obj)
+    elif isinstance(obj, dict):
+        size += sum(approxsize(k) + approxsize(v) for k, v in obj.items())
+    return size
+
+class BoundedCache:
+    """A least recently used cache limited by estimated memory size
+
+    name identifies the cache in reports
+    maxbytes is the memory budget.  An entry larger than the budget is not cached"""
+
+    def __init__(self, name, maxbytes):
+        self.name = name
+        self.maxbytes = self.defaultbytes = maxbytes
+        self.data = OrderedDict()
+        self.sizes = {}
+        self.bytes = 0
+        self.changed = False    # whether entries were added since the cache was loaded or saved
+        self.resetstats()
+
+    def resetstats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the value for key or MISSING"""
+
+        value = self.data.get(key, MISSING)
+        if value is MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.data.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        """Add or replace the value for key, evicting old entries to stay within the budget"""
+
+        size = approxsize(key) + approxsize(value) + ENTRYOVERHEAD
+        if key in self.data:
+            self.bytes -= self.sizes[key]
+            del self.data[key]
+        if size > self.maxbytes:
+            return
+        self.data[key] = value
+        self.sizes[key] = size
+        self.bytes += size
+        self.changed = True
+        self.shrink()
+
+    def shrink(self):
+        """Evict least recently used entries until the cache is within its budget"""
+
+        while self.bytes > self.maxbytes:
+            key, value = self.data.popitem(last=False)
+            self.bytes -= self.sizes.pop(key)
+            self.evictions += 1
+
+    def setbudget(self, maxbytes=None):
+        """Set the budget to maxbytes or, if None, to the budget the cache was created with"""
+
+        self.maxbytes = maxbytes or self.defaultbytes
+        self.shrink()
+
+    def clear(self):
+        """Remove all entries, e.g., because the values they were computed from have changed
+
+        A cleared cache has no entries to save, so it is not changed, and a saved file is kept"""
+
+        self.data.clear()
+        self.sizes.clear()
+        self.bytes = 0
+        self.changed = False
+
+    def save(self, filespec, header):
+        """Save the entries in filespec with header, replacing it atomically
+
+        header is a marshalable value that load must match, such as a version.
+        Entries are saved from least to most recently used, so loading keeps that order"""
+
+        temp = filespec + ".{0}.tmp".format(os.getpid())
+        try:
+            with open(temp, "wb") as f:
+                marshal.dump((header, sys.version), f)
+                marshal.dump(list(self.data.items()), f)
+            os.replace(temp, filespec)
+            self.changed = False
+        except (OSError, ValueError):
+            # the entries will just be computed again next time
+            try:
+                os.remove(temp)
+            except OSError:
+                pass
+
+    def load(self, filespec, header):
+        """Add the entries saved in filespec if it was saved with header and return the number added"""
+
+        try:
+            with open(filespec, "rb") as f:
+                if marshal.load(f) != (header, sys.version):
+                    return 0
+                items = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            return 0
+        changed = self.changed
+        for key, value in items:
+            self.put(key, value)
+        self.changed = changed
+        return len(items)
+
+    def stats(self):
+        """Return hits, misses, evictions, entries, and bytes"""
+
+        return self.hits, self.misses, self.evictions, len(self.data), self.bytes
+
+    def __len__(self):
+        return len(self.data)
+
+# all the caches by name
+caches = {}
+budgetoverride = None    # the budget set for all caches or None for their own defaults
+
+def getcache(name, maxbytes):
+    """Return the cache called name, creating it with budget maxbytes if it does not exist"""
+
+    cache = caches.get(name)
+    if cache is None:
+        cache = caches[name] = BoundedCache(name, maxbytes)
+        if budgetoverride:
+            cache.setbudget(budgetoverride)
+    return cache
+
+def cached(name, maxbytes):
+    """Return a decorator that caches the results of a function in cache name
+
+    The function arguments, which must be hashable, are the key"""
+
+    def decorator(func):
+        cache = getcache(name, maxbytes)
+        def wrapper(*args):
+            value = cache.get(args)
+            if value is MISSING:
+                value = func(*args)
+                cache.put(args, value)
+            return value
+        wrapper.cache = cache
+        wrapper.__name__ = func.__name__
+        wrapper.__doc__ = func.__doc__
+        return wrapper
+    return decorator
+
+def setbudgets(maxbytes=None):
+    """Set the budget of every cache, including those created later, to maxbytes or, if None, to its default"""
+
+    global budgetoverride
+    budgetoverride = maxbytes
+    for cache in caches.values():
+        cache.setbudget(maxbytes)
+
+def resetstats():
+    """Reset the use counts of every cache"""
+
+    for cache in caches.values():
+        cache.resetstats()
+
+def totalhits():
+    """Return the number of hits of all the caches since the counts were reset"""
+
+    return sum(cache.hits for cache in caches.values())
+
+def usedcaches():
+    """Return the caches that have been used since the counts were reset, sorted by name"""
+
+    return [caches[name] for name in sorted(caches) if caches[name].hits or caches[name].misses]
@@ -0,0 +1,186 @@
+# inverted index of the words and n-grams of a text variable
+
+# Author: Jon K Peck
+# History
+# 18-oct-2026 Initial version
+# 18-oct-2026 Version 2 to drop indexes built from tokens of the original case text
+
+# The index maps each word, bigram, and trigram of a text variable to the
+# sorted case numbers where it occurs, so a SEARCH can be answered by
+# combining postings instead of tokenizing every case again.  The cases are
+# indexed in blocks, and a hash of the text of each block is kept so that,
+# when the index is reused, only blocks whose text has changed need to be
+# tokenized again.
+# This module does not use spss, so it can be used outside of Statistics.
+
+import marshal, os, sys, hashlib
+from array import array
+
+INDEX_VERSION = 2
+
+def blockhash(texts):
+    """Return a hash of a sequence of texts"""
+
+    h = hashlib.sha1()
+    for t in texts:
+        h.update(t.encode("utf-8", "surrogatepass"))
+        h.update(b"\0")
+    return h.digest()
+
+def toarray(postings):
+    """Return postings as an array, converting from bytes as saved"""
+
+    if isinstance(postings, bytes):
+        return array("i", postings)
+    return postings
+
+class TextIndex:
+    """Postings of case numbers for the words and n-grams of one variable
+
+    key identifies what was indexed, such as the variable name and stemming,
+    and blocksize is the number of cases per hashed block.
+    grams[0] maps words to postings.  grams[1] and grams[2] map the first word
+    of each bigram or trigram to a dictionary from the tuple of the remaining words
+    to postings.  blanks are the cases with no text"""
+
+    def __init__(self, key, blocksize):
+        self.key = key
+        self.blocksize = blocksize
+        self.ncases = 0
+        self.blockhashes = []
+        self.grams = [{}, {}, {}]
+        self.blanks = array("i")
+
+    def addcase(self, caseno, tokens):
+        """Add the words and n-grams of a case
+
+        caseno must be larger than any case already added
+        tokens is the sequence of tokens or None if the case is blank"""
+
+        if tokens is None:
+            self.blanks.append(caseno)
+            return
+        words = self.grams[0]
+        for w in set(tokens):
+            postings = words.get(w)
+            if postings is None:
+                words[w] = postings = array("i")
+            postings.append(caseno)
+        for n in (2, 3):
+            grams = self.grams[n-1]
+            for gram in set(zip(*(tokens[i:] for i in range(n)))):
+                sub = grams.get(gram[0])
+                if sub is None:
+                    grams[gram[0]] = sub = {}
+                postings = sub.get(gram[1:])
+                if postings is None:
+                    sub[gram[1:]] = postings = array("i")
+                postings.append(caseno)
+
+    def dropblocks(self, blocks):
+        """Remove the cases in the set of block numbers blocks and all cases after ncases"""
+
+        bs = self.blocksize
+        ncases = self.ncases
+
+        def keep(postings):
+            return array("i", (c for c in toarray(postings) if c < ncases and c // bs not in blocks))
+
+        self.blanks = keep(self.blanks)
+        words = self.grams[0]
+        for w in list(words):
+            words[w] = keep(words[w])
+            if not words[w]:
+                del words[w]
+        for grams in self.grams[1:]:
+            for first in list(grams):
+                sub = grams[first]
+                for rest in list(sub):
+                    sub[rest] = keep(sub[rest])
+                    if not sub[rest]:
+                        del sub[rest]
+                if not sub:
+                    del grams[first]
+
+    def merge(self, other):
+        """Add the postings of other, whose cases are all different from these, keeping them sorted"""
+
+        def combine(a, b):
+            if a is None:
+                return toarray(b)
+            return array("i", sorted(toarray(a) + toarray(b)))
+
+        self.blanks = combine(self.blanks, other.blanks)
+        words = self.grams[0]
+        for w, postings in other.grams[0].items():
+            words[w] = combine(words.get(w), postings)
+        for grams, othergrams in zip(self.grams[1:], other.grams[1:]):
+            for first, othersub in othergrams.items():
+                sub = grams.setdefault(first, {})
+                for rest, postings in othersub.items():
+                    sub[rest] = combine(sub.get(rest), postings)
+
+    def matches(self, slots):
+        """Return the set of cases containing a word or n-gram matching slots
+
+        slots is a sequence of sets of acceptable words, one per position"""
+
+        result = set()
+        if len(slots) == 1:
+            words = self.grams[0]
+            for w in slots[0]:
+                postings = words.get(w)
+                if postings is not None:
+                    result.update(toarray(postings))
+            return result
+        grams = self.grams[len(slots) - 1]
+        rests = slots[1:]
+        for first in slots[0]:
+            sub = grams.get(first)
+            if sub is None:
+                continue
+            for rest, postings in sub.items():
+                if all(w in s for w, s in zip(rest, rests)):
+                    result.update(toarray(postings))
+        return result
+
+    def blankset(self):
+        return set(toarray(self.blanks))
+
+    def save(self, filespec):
+        """Save the index in filespec, replacing it atomically"""
+
+        def tobytes(postings):
+            return postings if isinstance(postings, bytes) else postings.tobytes()
+
+        grams = [{w: tobytes(p) for w, p in self.grams[0].items()}]
+        for g in self.grams[1:]:
+            grams.append({first: {rest: tobytes(p) for rest, p in sub.items()} for first, sub in g.items()})
+        temp = filespec + ".{0}.tmp".format(os.getpid())
+        try:
+            with open(temp, "wb") as f:
+                marshal.dump((INDEX_VERSION, sys.version, self.key, self.blocksize), f)
+                marshal.dump((self.ncases, self.blockhashes, tobytes(self.blanks), grams), f)
+            os.replace(temp, filespec)
+        except OSError:
+            # the index will just be rebuilt next time
+            try:
+                os.remove(temp)
+            except OSError:
+                pass
+
+    @classmethod
+    def load(cls, filespec, key, blocksize):
+        """Return the index saved in filespec or None if there is none for key and blocksize
+
+        Postings stay as bytes until they are used"""
+
+        try:
+            with open(filespec, "rb") as f:
+                if marshal.load(f) != (INDEX_VERSION, sys.version, key, blocksize):
+                    return None
+                index = cls(key, blocksize)
+                index.ncases, index.blockhashes, index.blanks, index.grams = marshal.load(f)
+                return index
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
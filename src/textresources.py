@@ -0,0 +1,144 @@
+# nltk data resources needed by the text analysis tasks
+
+# Author: Jon K Peck
+# History
+# 18-oct-2026 Initial version
+# 18-oct-2026 Choose the resource packages from the nltk version
+
+# Each task needs some nltk data packages, which nltk can read either from a
+# zip file or from an unzipped directory under any of the nltk data directories.
+# Where a resource was found is recorded in a manifest file with the size and
+# modification time of the zip file, so later sessions can verify the resources
+# with one stat call each instead of searching for them.  Nothing is downloaded
+# here unless the caller asks for it.
+# This module does not use spss, so it can be used outside of Statistics.
+
+import os, re, json
+import nltk
+
+MANIFEST_NAME = "resources.json"
+MANIFEST_VERSION = 2
+
+def nltkversion():
+    """Return the nltk version as a tuple of integers"""
+
+    return tuple(int(part) for part in re.findall(r"\d+", nltk.__version__)[:3])
+
+# nltk 3.8.2 tokenizes with punkt_tab, and nltk 3.9 tags and chunks with the _eng and _tab
+# packages.  Those versions do not read the older pickled packages, so only the package
+# that the installed nltk reads will do
+NEWPUNKT = nltkversion() >= (3, 8, 2)
+NEWMODELS = nltkversion() >= (3, 9)
+
+# For each resource, the alternative locations, any one of which will do
+RESOURCES = {
+    "punkt": [NEWPUNKT and "tokenizers/punkt_tab" or "tokenizers/punkt"],
+    "stopwords": ["corpora/stopwords"],
+    "names": ["corpora/names"],
+    "wordnet": ["corpora/wordnet"],
+    "omw": ["corpora/omw-1.4", "corpora/omw"],
+    "vader_lexicon": ["sentiment/vader_lexicon"],
+    "averaged_perceptron_tagger": [NEWMODELS and "taggers/averaged_perceptron_tagger_eng"
+        or "taggers/averaged_perceptron_tagger"],
+    "maxent_ne_chunker": [NEWMODELS and "chunkers/maxent_ne_chunker_tab" or "chunkers/maxent_ne_chunker"],
+    "words": ["corpora/words"],
+}
+
+# the resources needed for each kind of work.  The caller asks for tokenize only
+# if the nltk tokenizer is used and for omw only for languages other than English
+FEATURES = {
+    "tokenize": ["punkt"],
+    "stopwords": ["stopwords"],
+    "names": ["names"],
+    "wordnet": ["wordnet"],
+    "omw": ["omw"],
+    "sentiment": ["vader_lexicon"],
+    "entities": ["averaged_perceptron_tagger", "maxent_ne_chunker", "words"],
+}
+
+def required(features):
+    """Return the sorted resource names needed for the features"""
+
+    return sorted(set(name for f in features for name in FEATURES[f]))
+
+def stamp(path):
+    """Return the kind, size, and modification time of path or None if it does not exist"""
+
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if os.path.isdir(path):
+        return ["dir", 0, st.st_mtime]
+    return ["zip", st.st_size, st.st_mtime]
+
+def locate(name):
+    """Return the path of resource name in the nltk data directories or None
+
+    An unzipped directory is preferred to a zip file, as in nltk"""
+
+    for loc in RESOURCES[name]:
+        for d in nltk.data.path:
+            for path in [os.path.join(d, *loc.split("/")), os.path.join(d, *loc.split("/")) + ".zip"]:
+                if os.path.exists(path):
+                    return path
+    return None
+
+class Manifest:
+    """Where the resources were found, saved in filespec
+
+    Entries are name: [path, kind, size, mtime].  The manifest is only used with the
+    nltk version it was saved with, since the resources needed depend on that"""
+
+    def __init__(self, filespec):
+        self.filespec = filespec
+        self.entries = {}
+        self.changed = False
+        try:
+            with open(filespec, encoding="utf-8") as f:
+                saved = json.load(f)
+            if (saved.get("version") == MANIFEST_VERSION and saved.get("datapath") == list(nltk.data.path)
+                    and saved.get("nltk") == nltk.__version__):
+                self.entries = saved["resources"]
+        except (OSError, ValueError, KeyError, AttributeError):
+            pass
+
+    def verify(self, names):
+        """Return the names that are not available, locating any that are not as recorded"""
+
+        missing = []
+        for name in names:
+            entry = self.entries.get(name)
+            if entry is not None and stamp(entry[0]) == entry[1:]:
+                continue
+            path = locate(name)
+            if path is None:
+                self.entries.pop(name, None)
+                missing.append(name)
+            else:
+                self.entries[name] = [path] + stamp(path)
+            self.changed = True
+        return missing
+
+    def save(self):
+        if not self.changed:
+            return
+        try:
+            with open(self.filespec, "w", encoding="utf-8") as f:
+                json.dump({"version": MANIFEST_VERSION, "datapath": list(nltk.data.path), "nltk": nltk.__version__,
+                    "resources": self.entries}, f, indent=1)
+            self.changed = False
+        except OSError:
+            # the resources will just be located again next time
+            pass
+
+def download(names):
+    """Download the missing resources into the default nltk data directory
+
+    All the alternative package names of each resource are requested.  This uses the network"""
+
+    from nltk import downloader
+    packages = [os.path.basename(loc) for name in names for loc in RESOURCES[name]]
+    dlpath = downloader.Downloader().default_download_dir()
+    print("Downloading nltk data files: {0} to {1}".format(packages, dlpath))
+    downloader.download(packages, quiet=True)
@@ -7,6 +7,9 @@
 # history
 # 03-01-2023 Set data file locations to be in STATS_TEXTANALYSIS subdirectory under the .py file
 # 03-01-2023 Use zip file for lexicon data
+# 10-18-2026 Keep a compiled cache of the lexicon and emoji dictionaries checked against the zip checksums
+# 10-18-2026 Single positional pass in polarity_scores with tokens case-folded once
+# 10-18-2026 Keep the lexicon cache in the caller's per-user cache directory in marshal format
 
 """
 If you use the VADER sentiment analysis tools, please cite:
@@ -21,10 +24,10 @@ import string
 ### import requests  2/2023
 import json
 import csv
-from itertools import product
 from inspect import getsourcefile
 from io import open
 import zipfile
+import marshal
 
 # ##Constants##
 
@@ -41,6 +44,7 @@ REGEX_REMOVE_PUNCTUATION = re.compile('[%s]' % re.escape(string.punctuation))
 
 PUNC_LIST = [".", "!", "?", ",", ";", ":", "-", "'", "\"",
              "!!", "!!!", "??", "???", "?!?", "!?!", "?!?!", "!?!?"]
+PUNC_SET = frozenset(PUNC_LIST)
 NEGATE_EN = \
     ["aint", "arent", "cannot", "cant", "couldnt", "darent", "didnt", "doesnt",
      "ain't", "aren't", "can't", "couldn't", "daren't", "didn't", "doesn't",
@@ -169,10 +173,8 @@ def negated(input_words, include_nt=True):
     Determine if input contains negation words
     """
     input_words = [str(w).lower() for w in input_words]
-    neg_words = []
-    neg_words.extend(NEGATE)
-    for word in neg_words:
-        if word in input_words:
+    for word in input_words:
+        if word in NEGATE:
             return True
     if include_nt:
         for word in input_words:
@@ -236,6 +238,62 @@ def scalar_inc_dec(word, valence, is_cap_diff):
     return scalar
 
 
+# #Compiled lexicon cache# #
+
+# The cache holds a header identifying the zip members it was built from followed by
+# the lexicon and emoji dictionaries, both in marshal format, which only holds data.
+# Bump the version if the layout changes.
+LEXCACHE_VERSION = 2
+LEXCACHE_NAME = "lex.cache"
+
+
+def lexcachefile(cachedir):
+    """
+    Return the compiled cache file location in cachedir.
+    cachedir should be private to the user, since the cache is trusted
+    """
+    return os.path.join(cachedir, LEXCACHE_NAME)
+
+
+def loadlexicons(lexiconpath, lexicon_file, emoji_lexicon, cachedir=None):
+    """
+    Return the lexicon and emoji dictionaries for the zip file.
+    They are read from the compiled cache in cachedir if its header matches the checksums
+    of the zip members and otherwise parsed from the zip and the cache rebuilt.
+    If cachedir is None, no cache is used
+    """
+    with zipfile.ZipFile(lexiconpath) as lexgerman:
+        # the member checksums come from the zip directory, so nothing is inflated here
+        header = (LEXCACHE_VERSION,) + tuple((info.filename, info.CRC, info.file_size)
+            for info in (lexgerman.getinfo(lexicon_file), lexgerman.getinfo(emoji_lexicon)))
+        cachefile = cachedir and lexcachefile(cachedir)
+        if cachefile:
+            try:
+                with open(cachefile, "rb") as f:
+                    if marshal.load(f) == header:
+                        lexicon, emojis = marshal.load(f)
+                        if isinstance(lexicon, dict) and isinstance(emojis, dict):
+                            return lexicon, emojis
+            except Exception:
+                pass    # missing, stale, or unreadable cache
+        with lexgerman.open(lexicon_file) as lex:
+            lexicon = SentimentIntensityAnalyzer.make_lex_dict(lex.read().decode("utf-8"))
+        with lexgerman.open(emoji_lexicon) as lex:
+            emojis = SentimentIntensityAnalyzer.make_emoji_dict(lex.read().decode("utf-8"))
+    if not cachefile:
+        return lexicon, emojis
+    # write to a temporary name and rename so that a concurrent reader never sees a partial file
+    try:
+        tempname = "{0}.{1}".format(cachefile, os.getpid())
+        with open(tempname, "wb") as f:
+            marshal.dump(header, f)
+            marshal.dump((lexicon, emojis), f)
+        os.replace(tempname, cachefile)
+    except Exception:
+        pass    # the cache is only an optimization
+    return lexicon, emojis
+
+
 class SentiText(object):
     """
     Identify sentiment-relevant string-level properties of input text.
@@ -248,40 +306,37 @@ class SentiText(object):
         self.words_and_emoticons = self._words_and_emoticons()
         # doesn't separate words from\
         # adjacent punctuation (keeps emoticons & contractions)
+        # case-folded once here for all the checks in the scoring pass
+        self.words_lower = [w.lower() for w in self.words_and_emoticons]
         self.is_cap_diff = allcap_differential(self.words_and_emoticons)
 
-    def _words_plus_punc(self):
-        """
-        Returns mapping of form:
-        {
-            'cat,': 'cat',
-            ',cat': 'cat',
-        }
-        """
-        no_punc_text = REGEX_REMOVE_PUNCTUATION.sub('', self.text)
-        # removes punctuation (but loses emoticons & contractions)
-        words_only = no_punc_text.split()
-        # remove singletons
-        words_only = set(w for w in words_only if len(w) > 1)
-        # the product gives ('cat', ',') and (',', 'cat')
-        punc_before = {''.join(p): p[1] for p in product(PUNC_LIST, words_only)}
-        punc_after = {''.join(p): p[0] for p in product(words_only, PUNC_LIST)}
-        words_punc_dict = punc_before
-        words_punc_dict.update(punc_after)
-        return words_punc_dict
-
     def _words_and_emoticons(self):
         """
         Removes leading and trailing puncutation
         Leaves contractions and most emoticons
             Does not preserve punc-plus-letter emoticons (e.g. :D)
         """
-        wes = self.text.split()
-        words_punc_dict = self._words_plus_punc()
-        wes = [we for we in wes if len(we) > 1]
-        for i, we in enumerate(wes):
-            if we in words_punc_dict:
-                wes[i] = words_punc_dict[we]
+        # A token is replaced by its word when it is one of the PUNC_LIST items
+        # followed or preceded by a word of two or more characters that has no punctuation.
+        # Each token can be split that way in at most one place, so it is checked
+        # directly instead of building every punctuation and word combination.
+        no_punc_text = REGEX_REMOVE_PUNCTUATION.sub('', self.text)
+        # removes punctuation (but loses emoticons & contractions)
+        # remove singletons
+        words_only = set(w for w in no_punc_text.split() if len(w) > 1)
+        wes = []
+        for we in self.text.split():
+            if len(we) <= 1:
+                continue
+            if we[0] in string.punctuation:
+                word = we.lstrip(string.punctuation)
+                if word in words_only and we[:len(we) - len(word)] in PUNC_SET:
+                    we = word
+            elif we[-1] in string.punctuation:
+                word = we.rstrip(string.punctuation)
+                if word in words_only and we[len(word):] in PUNC_SET:
+                    we = word
+            wes.append(we)
         return wes
 
 
@@ -293,45 +348,53 @@ class SentimentIntensityAnalyzer(object):
     # Contents are the lexicon and emoji files.
     # They are assumed to be in utf-8 encoding and to have \n line ending but they need to be decoded to strings.
     # The Zip read function only reads in b mode.
+    # The parsed dictionaries are kept in a compiled cache file in cachedir so that the zip members only need to be
+    # inflated and parsed when the zip contents change.  See loadlexicons.
     
-    def __init__(self, lexicon_file="GERVaderLexicon.txt", emoji_lexicon="emoji_utf8_lexicon.txt"):
+    def __init__(self, lexicon_file="GERVaderLexicon.txt", emoji_lexicon="emoji_utf8_lexicon.txt", cachedir=None):
         
         _this_module_file_path_ = os.path.abspath(getsourcefile(lambda: 0))
         #lexicon_full_filepath = os.path.join(os.path.dirname(_this_module_file_path_), "STATS_TEXTANALYSIS", lexicon_file)
         lexiconpath = os.path.join(os.path.dirname(_this_module_file_path_), "STATS_TEXTANALYSIS", "lex.ZIP")
 
         try:
-            with zipfile.ZipFile(lexiconpath) as lexgerman:
-                with lexgerman.open(lexicon_file) as lex:
-                    self.lexicon_full_filepath = lex.read().decode("utf-8")
-                with lexgerman.open(emoji_lexicon) as lex:
-                    self.emoji_full_filepath = lex.read().decode("utf-8")
-                self.lexicon = self.make_lex_dict()
-                self.emojis = self.make_emoji_dict()    
+            self.lexicon, self.emojis = loadlexicons(lexiconpath, lexicon_file, emoji_lexicon, cachedir)
         except:
             print(f"""German lexicon file {lexicon_file} could not be found or could not be read.""")
             raise 
+        self._folded = None
+        self._foldedsize = -1
+
+    def _lexicon_folded(self):
+        """
+        Return the set of case-folded lexicon words.  A token whose folded form is
+        not in it cannot match the lexicon in any of the case variants tried.
+        The lexicon can have words added after construction, so the set is
+        rebuilt when the lexicon size changes
+        """
+        if self._foldedsize != len(self.lexicon):
+            self._folded = set(word.lower() for word in self.lexicon)
+            self._foldedsize = len(self.lexicon)
+        return self._folded
 
-    def make_lex_dict(self):
+    @staticmethod
+    def make_lex_dict(lexicon_text):
         """
-        Convert lexicon file to a dictionary
+        Convert lexicon file contents to a dictionary
         """
         lex_dict = {}
-        for line in self.lexicon_full_filepath.split('\n'):
+        for line in lexicon_text.split('\n'):
             (word, measure) = line.strip().split('\t')[0:2]
             lex_dict[word] = float(measure)
-        #for key,val in lex_dict.items():
-        #    print (key, "\t\t", val)
-        #with open('outputmap.txt', 'w') as f:
-            #print (lex_dict, file=f)
         return lex_dict
 
-    def make_emoji_dict(self):
+    @staticmethod
+    def make_emoji_dict(emoji_text):
         """
-        Convert emoji lexicon file to a dictionary
+        Convert emoji lexicon file contents to a dictionary
         """
         emoji_dict = {}
-        for line in self.emoji_full_filepath.split('\n'):
+        for line in emoji_text.split('\n'):
             (emoji, description) = line.strip().split('\t')[0:2]
             emoji_dict[emoji] = description
         return emoji_dict
@@ -358,21 +421,24 @@ class SentimentIntensityAnalyzer(object):
 
         sentiments = []
         words_and_emoticons = sentitext.words_and_emoticons
-        for item in words_and_emoticons:
+        words_lower = sentitext.words_lower
+        last = len(words_and_emoticons) - 1
+        # single positional pass: i is the position of item, not of its first occurrence
+        for i, item in enumerate(words_and_emoticons):
             valence = 0
-            i = words_and_emoticons.index(item)
+            item_lower = words_lower[i]
             # check for vader_lexicon words that may be used as modifiers or negations
-            if item.lower() in BOOSTER_DICT:
+            if item_lower in BOOSTER_DICT:
                 sentiments.append(valence)
                 continue
-            if (i < len(words_and_emoticons) - 1 and item.lower() == "kind" and
-                words_and_emoticons[i + 1].lower() == "of"):
+            if (i < last and item_lower == "kind" and
+                words_lower[i + 1] == "of"):
                 sentiments.append(valence)
                 continue
 
             sentiments = self.sentiment_valence(valence, sentitext, item, i, sentiments)
 
-        sentiments = self._but_check(words_and_emoticons, sentiments)
+        sentiments = self._but_check(words_lower, sentiments)
 
         valence_dict = self.score_valence(sentiments, text)
 
@@ -381,19 +447,23 @@ class SentimentIntensityAnalyzer(object):
     def sentiment_valence(self, valence, sentitext, item, i, sentiments):
         is_cap_diff = sentitext.is_cap_diff
         words_and_emoticons = sentitext.words_and_emoticons
-                # change
-        item_lowercase = item.lower()
-        item_lowercase = item
-                # change
-        if item_lowercase not in self.lexicon:
-            item_lowercase = item.lower()
-                        # change
-            if item_lowercase not in self.lexicon:
-                item_lowercase = item.capitalize()
-                # -------- Originale Fortsetzung
-        if item_lowercase in self.lexicon:
+        words_lower = sentitext.words_lower
+        lexicon = self.lexicon
+        # look the word up as written, then lower case, then capitalized (German nouns).
+        # Most words are in none of these forms, which one lookup of the folded form settles.
+        item_lower = words_lower[i]
+        lexvalence = None
+        folded = self._lexicon_folded()
+        # capitalizing then folding only differs from folding for a non-ASCII first letter such as sharp s
+        if item_lower in folded or (not item_lower[:1].isascii() and item.capitalize().lower() in folded):
+            lexvalence = lexicon.get(item)
+            if lexvalence is None:
+                lexvalence = lexicon.get(item_lower)
+                if lexvalence is None:
+                    lexvalence = lexicon.get(item.capitalize())
+        if lexvalence is not None:
             # get the sentiment valence
-            valence = self.lexicon[item_lowercase]
+            valence = lexvalence
             # check if sentiment laden word is in ALL CAPS (while others aren't)
             if item.isupper() and is_cap_diff:
                 if valence > 0:
@@ -405,51 +475,49 @@ class SentimentIntensityAnalyzer(object):
                 # dampen the scalar modifier of preceding words and emoticons
                 # (excluding the ones that immediately preceed the item) based
                 # on their distance from the current item.
-                if i > start_i and words_and_emoticons[i - (start_i + 1)].lower() not in self.lexicon:
+                if i > start_i and words_lower[i - (start_i + 1)] not in lexicon:
                     s = scalar_inc_dec(words_and_emoticons[i - (start_i + 1)], valence, is_cap_diff)
                     if start_i == 1 and s != 0:
                         s = s * 0.95
                     if start_i == 2 and s != 0:
                         s = s * 0.9
                     valence = valence + s
-                    valence = self._negation_check(valence, words_and_emoticons, start_i, i)
+                    valence = self._negation_check(valence, words_lower, start_i, i)
                     if start_i == 2:
-                        valence = self._special_idioms_check(valence, words_and_emoticons, i)
+                        valence = self._special_idioms_check(valence, words_lower, i)
 
-            valence = self._least_check(valence, words_and_emoticons, i)
+            valence = self._least_check(valence, words_lower, i)
         sentiments.append(valence)
         return sentiments
 
-    def _least_check(self, valence, words_and_emoticons, i):
+    def _least_check(self, valence, words_and_emoticons_lower, i):
         # check for negation case using "least"
-        if i > 1 and words_and_emoticons[i - 1].lower() not in self.lexicon \
-           and words_and_emoticons[i - 1].lower() == "least":
-            if words_and_emoticons[i - 2].lower() != "at" and words_and_emoticons[i - 2].lower() != "very":
+        # words_and_emoticons_lower is the case-folded token list
+        if i > 1 and words_and_emoticons_lower[i - 1] not in self.lexicon \
+           and words_and_emoticons_lower[i - 1] == "least":
+            if words_and_emoticons_lower[i - 2] != "at" and words_and_emoticons_lower[i - 2] != "very":
                 valence = valence * N_SCALAR
-        elif i > 0 and words_and_emoticons[i - 1].lower() not in self.lexicon \
-             and words_and_emoticons[i - 1].lower() == "least":
+        elif i > 0 and words_and_emoticons_lower[i - 1] not in self.lexicon \
+             and words_and_emoticons_lower[i - 1] == "least":
             valence = valence * N_SCALAR
         return valence
 
     @staticmethod
-    def _but_check(words_and_emoticons, sentiments):
+    def _but_check(words_and_emoticons_lower, sentiments):
         # check for modification in sentiment due to contrastive conjunction 'but'
-        words_and_emoticons_lower = [str(w).lower() for w in words_and_emoticons]
+        # sentiments are positional, one per token
         if 'but' in words_and_emoticons_lower:
             bi = words_and_emoticons_lower.index('but')
-            for sentiment in sentiments:
-                si = sentiments.index(sentiment)
+            for si, sentiment in enumerate(sentiments):
                 if si < bi:
-                    sentiments.pop(si)
-                    sentiments.insert(si, sentiment * 0.5)
+                    sentiments[si] = sentiment * 0.5
                 elif si > bi:
-                    sentiments.pop(si)
-                    sentiments.insert(si, sentiment * 1.5)
+                    sentiments[si] = sentiment * 1.5
         return sentiments
 
     @staticmethod
-    def _special_idioms_check(valence, words_and_emoticons, i):
-        words_and_emoticons_lower = [str(w).lower() for w in words_and_emoticons]
+    def _special_idioms_check(valence, words_and_emoticons_lower, i):
+        # words_and_emoticons_lower is the case-folded token list
         onezero = "{0} {1}".format(words_and_emoticons_lower[i - 1], words_and_emoticons_lower[i])
 
         twoonezero = "{0} {1} {2}".format(words_and_emoticons_lower[i - 2],
@@ -501,8 +569,8 @@ class SentimentIntensityAnalyzer(object):
         return valence
 
     @staticmethod
-    def _negation_check(valence, words_and_emoticons, start_i, i):
-        words_and_emoticons_lower = [str(w).lower() for w in words_and_emoticons]
+    def _negation_check(valence, words_and_emoticons_lower, start_i, i):
+        # words_and_emoticons_lower is the case-folded token list
         if start_i == 0:
             if negated([words_and_emoticons_lower[i - (start_i + 1)]]):  # 1 word preceding lexicon word (w/o stopwords)
                 valence = valence * N_SCALAR
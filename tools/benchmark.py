@@ -0,0 +1,478 @@
+"""Throughput benchmark for the STATS TEXTANALYSIS tasks outside of Statistics
+
+The spss, spssdata, spssaux, and extension modules are replaced by small
+in-process stand-ins that hold the active dataset as a list of cases, so the
+tasks run through dotext exactly as the command would run them, including
+the data pass and the writing of the new variables.  The data are a synthetic
+survey corpus of short answers with a configurable number of cases, length
+distribution, and rate of duplicate answers, with some names, typos, and
+blank answers mixed in.
+
+Each task is run in its own process with an empty cache directory and a copy
+of the source files laid out as in an installed extension, so the caches and
+memory of one task do not affect another and no cache files are written into
+the source tree.  For each task the
+report shows the time of the first run, which includes loading resources such
+as the sentiment lexicon or the spelling dictionary, the cases per second of
+that run and, with --repeat, of the fastest later run in the same process, and
+the peak memory of the process and how much it grew while running the task.
+After that, the function that does the work of the task, such as texta.freqs
+or sentscores, is applied to every case with the caches emptied, and its cases
+per second are shown next to those of the whole task.  The difference is the
+cost of the data pass, writing the new variables, and the task setup.
+The entities task also checks that each block of cases is tagged and chunked
+with one call of the nltk batch functions rather than one call per case.
+
+The nltk data needed by the tasks must be installed.  Use --download to
+download any that are missing.  Stopwords are not removed unless --stopwords
+is given, so the stopwords data is not needed otherwise.
+
+Usage: python tools/benchmark.py [--cases N] [--words MEAN] [--lengths fixed|uniform|exponential|lognormal]
+    [--duplicates RATE] [--blanks RATE] [--variables N] [--repeat N] [--seed N] [--tokenizer nltk|regex]
+    [--stopwords] [--download] [task ...]
+
+The tasks are frequencies, sentiment, german, spelling, search, entities, and stems.  The default is all of them.
+"""
+
+import os, sys, argparse, builtins, glob, json, random, resource, shutil, subprocess, tempfile, time, types
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+# dotext arguments and corpus language of each task
+TASKS = {
+    "frequencies": ({"dofreq": True}, "english"),
+    "sentiment": ({"dosent": True}, "english"),
+    "german": ({"dosent": True, "sentlang": "german"}, "german"),
+    "spelling": ({"dospelling": True}, "english"),
+    "search": ({"dosearch": True, "searchwords": ["helpful", "slow", "customer-service", "waiting-time"]}, "english"),
+    "entities": ({"doesearch": True}, "english"),
+    "stems": ({"dostems": True}, "english"),
+}
+
+#*****************************************************************
+# stand-ins for the Statistics modules
+
+class Dataset:
+    """The active dataset
+
+    names, types, and labels describe the variables, where the type is 0 for
+    numeric or the string width, and cases is the list of cases, each a list of values"""
+
+    def __init__(self):
+        self.names = []
+        self.types = {}
+        self.labels = {}
+        self.cases = []
+        self.weight = None
+        self.submitted = []
+        self.tables = []
+
+    def addvariable(self, name, vtype, label=""):
+        self.names.append(name)
+        self.types[name] = vtype
+        self.labels[name] = label
+        for case in self.cases:
+            case.append(None if vtype == 0 else "")
+
+    def delete(self, names):
+        drop = [i for i, name in enumerate(self.names) if name.lower() in names]
+        for i in reversed(drop):
+            name = self.names.pop(i)
+            del self.types[name], self.labels[name]
+            for case in self.cases:
+                del case[i]
+
+    def rename(self, old, new):
+        for o, n in zip(old, new):
+            i = [name.lower() for name in self.names].index(o.lower())
+            name = self.names[i]
+            self.names[i] = n
+            self.types[n] = self.types.pop(name)
+            self.labels[n] = self.labels.pop(name)
+
+dataset = Dataset()
+
+class Cursor:
+    """A spssdata.Spssdata cursor for reading cases or adding variables to the active dataset"""
+
+    def __init__(self, indexes=None, names=True, convertUserMissing=True, accessType="r", **kwargs):
+        if accessType not in ("r", "w"):
+            raise NotImplementedError("The benchmark cursor can only read cases and add variables")
+        if isinstance(indexes, str):
+            indexes = indexes.split()
+        self.indexes = [dataset.names.index(name) for name in indexes or dataset.names]
+        self.accessType = accessType
+        self.newvars = []
+        self.first = len(dataset.names)
+        self.case = None
+
+    def __iter__(self):
+        indexes = self.indexes
+        for case in dataset.cases:
+            self.case = case
+            yield tuple(case[i] for i in indexes)
+
+    def append(self, vdef):
+        self.newvars.append(vdef)
+
+    def commitdict(self):
+        self.first = len(dataset.names)
+        for v in self.newvars:
+            dataset.addvariable(v.name, v.vtype)
+
+    def casevalues(self, values):
+        self.case[self.first:self.first + len(values)] = values
+
+    def CClose(self):
+        self.case = None
+
+class VariableDef:
+    """A spssdata.vdef variable definition"""
+
+    def __init__(self, name, vtype=0, **kwargs):
+        self.name = name
+        self.vtype = vtype
+
+class Variable:
+    def __init__(self, name):
+        self.VariableName = name
+        self.VariableType = dataset.types[name]
+        self.VariableLabel = dataset.labels[name]
+
+class VariableDict:
+    """A spssaux.VariableDict of the active dataset or of the listed variables"""
+
+    def __init__(self, namelist=None, **kwargs):
+        if isinstance(namelist, str):
+            namelist = [namelist]
+        self.variables = list(namelist or dataset.names)
+
+    def __getitem__(self, name):
+        return Variable(name)
+
+    def __iter__(self):
+        return (Variable(name) for name in self.variables)
+
+class PivotTable:
+    """A spss.BasePivotTable that keeps only its title"""
+
+    def __init__(self, title, templatename, *args, **kwargs):
+        dataset.tables.append(title)
+
+    def SetDefaultFormatSpec(self, *args):
+        pass
+
+    def SimplePivotTable(self, **kwargs):
+        pass
+
+def submit(cmds):
+    """Record commands and carry out the ones the tasks use"""
+
+    if isinstance(cmds, str):
+        cmds = [cmds]
+    for cmd in cmds:
+        dataset.submitted.append(cmd)
+        words = cmd.rstrip(". ").split()
+        if [w.upper() for w in words[:2]] == ["DELETE", "VARIABLES"]:
+            dataset.delete(set(w.lower() for w in words[2:]))
+        elif [w.upper() for w in words[:2]] == ["RENAME", "VARIABLES"]:
+            old, new = " ".join(words[2:]).strip("()").split("=")
+            dataset.rename(old.split(), new.split())
+
+def module(name, **attrs):
+    mod = types.ModuleType(name)
+    mod.__dict__.update(attrs)
+    sys.modules[name] = mod
+    return mod
+
+def installstubs():
+    """Install the stand-in modules and a gettext function, as Statistics would"""
+
+    module("spss",
+        Submit=submit,
+        GetWeightVar=lambda: dataset.weight,
+        GetVariableName=lambda i: dataset.names[i],
+        GetVariableCount=lambda: len(dataset.names),
+        ActiveDataset=lambda: "benchmark",
+        StartProcedure=lambda *args: None,
+        EndProcedure=lambda: None,
+        AddProcedureFootnotes=lambda *args: None,
+        BasePivotTable=PivotTable,
+        FormatSpec=types.SimpleNamespace(GeneralStat=0, Count=1),
+        GetDefaultPlugInVersion=lambda: "spss270")
+    module("spssdata", Spssdata=Cursor, vdef=VariableDef)
+    module("spssaux",
+        VariableDict=VariableDict,
+        FileHandles=lambda: types.SimpleNamespace(resolve=lambda f: f),
+        GetDatasetInfo=lambda item: "",
+        _isseq=lambda obj: isinstance(obj, (list, tuple)))
+    module("extension",
+        Template=lambda *args, **kwargs: None,
+        Syntax=lambda *args, **kwargs: None,
+        processcmd=lambda *args, **kwargs: None)
+    if not hasattr(builtins, "_"):
+        builtins._ = lambda msg: msg
+
+#*****************************************************************
+# synthetic survey answers
+
+WORDS = {
+    "english": {
+        "common": """the a and was were is it to of for with very too not but
+            I we they my our this that staff service product delivery order time
+            price support customer waiting website app store team call email""".split(),
+        "opinion": """good great excellent helpful friendly fast easy happy recommend
+            bad poor slow terrible rude expensive difficult disappointed confusing late
+            okay fine average quick broken cheap clean dirty professional""".split(),
+        "filler": """really quite just also again when after before because about
+            would could should never always sometimes every first last other""".split(),
+        "names": "Alice Bob Maria John London Paris Amazon Microsoft Chicago Sarah".split(),
+    },
+    "german": {
+        "common": """der die das und war ist es zu von für mit sehr zu nicht aber
+            ich wir sie mein unser dieser Personal Service Produkt Lieferung
+            Bestellung Zeit Preis Kunde Wartezeit Webseite Laden Team Anruf""".split(),
+        "opinion": """gut toll hervorragend hilfreich freundlich schnell einfach
+            zufrieden empfehlen schlecht langsam schrecklich unhöflich teuer
+            schwierig enttäuscht verwirrend spät okay billig sauber schmutzig""".split(),
+        "filler": """wirklich ziemlich nur auch wieder wenn nachdem weil immer
+            manchmal nie jeden ersten letzten anderen""".split(),
+        "names": "Anna Peter Müller Berlin München Hamburg Siemens Lufthansa Klaus Petra".split(),
+    },
+}
+
+def answerlength(rng, mean, lengths):
+    """Return the number of words in an answer"""
+
+    if lengths == "fixed":
+        return mean
+    if lengths == "uniform":
+        return rng.randint(1, 2 * mean - 1)
+    if lengths == "exponential":
+        return max(1, int(rng.expovariate(1 / mean)))
+    # lognormal, with the long tail of survey answers
+    return max(1, int(rng.lognormvariate(0, 1) * mean / 1.65))
+
+def typo(rng, word):
+    """Return word with two adjacent letters swapped or a letter dropped"""
+
+    if len(word) < 4:
+        return word
+    i = rng.randrange(len(word) - 1)
+    if rng.random() < .5:
+        return word[:i] + word[i+1] + word[i] + word[i+2:]
+    return word[:i] + word[i+1:]
+
+def answer(rng, words, nwords, typos):
+    """Return an answer of nwords words in sentences of up to 12 words"""
+
+    sentences = []
+    while nwords > 0:
+        n = min(nwords, rng.randint(4, 12))
+        nwords -= n
+        sentence = []
+        for i in range(n):
+            r = rng.random()
+            if r < .45:
+                w = rng.choice(words["common"])
+            elif r < .75:
+                w = rng.choice(words["opinion"])
+            elif r < .95:
+                w = rng.choice(words["filler"])
+            else:
+                w = rng.choice(words["names"])
+            if rng.random() < typos:
+                w = typo(rng, w)
+            sentence.append(w)
+        sentence[0] = sentence[0][:1].upper() + sentence[0][1:]
+        sentences.append(" ".join(sentence) + rng.choice([".", ".", ".", "!", "?"]))
+    return " ".join(sentences)
+
+def corpus(cases, mean=15, lengths="lognormal", duplicates=.2, blanks=.1, typos=.03, language="english", seed=1):
+    """Return a list of cases answers
+
+    mean is the mean number of words in an answer and lengths the distribution of the length.
+    duplicates is the fraction of answers that repeat an earlier answer, as short common
+    answers do in surveys, and blanks the fraction that are empty"""
+
+    rng = random.Random(seed)
+    words = WORDS[language]
+    result = []
+    distinct = []
+    for i in range(cases):
+        r = rng.random()
+        if r < blanks:
+            result.append("")
+        elif r < blanks + duplicates and distinct:
+            # short answers are repeated more often
+            result.append(min(rng.choice(distinct), rng.choice(distinct), key=len))
+        else:
+            text = answer(rng, words, answerlength(rng, mean, lengths), typos)
+            distinct.append(text)
+            result.append(text)
+    return result
+
+#*****************************************************************
+
+def peakmb():
+    """Return the peak resident memory of this process in megabytes"""
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+def runtask(task, args):
+    """Run task in this process and return its measurements"""
+
+    installstubs()
+    sys.path.insert(0, args.extdir)
+    import STATS_TEXTANALYSIS, texta, nltk
+
+    kwargs, language = TASKS[task]
+    varnames = ["answer{0}".format(i + 1) for i in range(args.variables)]
+    columns = [corpus(args.cases, args.words, args.lengths, args.duplicates, args.blanks, args.typos,
+        language, args.seed + i) for i in range(args.variables)]
+    width = max(1, max(len(text.encode("utf-8")) for col in columns for text in col))
+    for name in varnames:
+        dataset.addvariable(name, width)
+    dataset.cases = [list(case) for case in zip(*columns)]
+    kwargs = dict(kwargs, varnames=varnames, overwrite=True, savestems=False, download=args.download,
+        tokenizer=args.tokenizer, stopwordslang=args.stopwords and language or "none")
+    calls = dict.fromkeys(["pos_tag_sents", "ne_chunk_sents"], 0)
+    if task == "entities":
+        for name in calls:
+            countcalls(nltk, name, calls)
+    baseline = peakmb()
+    times = []
+    for i in range(args.repeat):
+        start = time.perf_counter()
+        STATS_TEXTANALYSIS.dotext(**kwargs)
+        times.append(time.perf_counter() - start)
+    peak = peakmb()
+    # one call per block and variable, or fewer if the memo has all the texts of a block
+    blocks = args.repeat * args.variables * -(-args.cases // texta.BLOCKSIZE)
+    for name, n in calls.items():
+        if n > blocks:
+            raise RuntimeError("{0} was called {1} times for {2} blocks".format(name, n, blocks))
+    function, seconds = timefunction(task, varnames, columns, kwargs)
+    return {"first": times[0], "warm": min(times[1:]) if len(times) > 1 else None,
+        "peak": peak, "added": peak - baseline, "function": function, "seconds": seconds}
+
+def countcalls(mod, name, calls):
+    """Replace function name of module mod with one that also counts its calls in calls[name]"""
+
+    func = getattr(mod, name)
+    def counted(*args, **kwargs):
+        calls[name] += 1
+        return func(*args, **kwargs)
+    setattr(mod, name, counted)
+
+def timefunction(task, varnames, columns, kwargs):
+    """Return the name of the function that does the work of task and the seconds it takes for every case
+
+    The caches are emptied first.  dotext has already run, so the resources are loaded and the
+    settings made.  The name and time are None for tasks without such a function"""
+
+    import STATS_TEXTANALYSIS, texta, textcache
+    for cache in textcache.caches.values():
+        cache.clear()
+    texts = [text for col in columns for text in col]
+    if task == "frequencies":
+        start = time.perf_counter()
+        for name in varnames:
+            texta.freqs(name)
+        return "texta.freqs", time.perf_counter() - start
+    if task == "sentiment":
+        name, func = "sentscores", texta.sentscores
+    elif task == "german":
+        # the analyzer does not take blank text, which the command skips
+        name, func = "polarity_scores", texta.sentimentanalyzer().polarity_scores
+        texts = [text for text in texts if text.strip()]
+    elif task == "search":
+        words = STATS_TEXTANALYSIS.makesearch(kwargs["searchwords"], None, "eng")
+        name, func = "haswords", lambda text: texta.haswords(text, words)
+    elif task == "entities":
+        name, func = "hasnes", lambda text: texta.hasnes(text, "alltypes", None)
+    else:
+        return None, None
+    start = time.perf_counter()
+    for text in texts:
+        func(text)
+    return name, time.perf_counter() - start
+
+def install(extdir):
+    """Copy the modules to extdir and the German lexicon to the STATS_TEXTANALYSIS directory under it"""
+
+    for f in glob.glob(os.path.join(SRC, "*.py")):
+        shutil.copy(f, extdir)
+    os.mkdir(os.path.join(extdir, "STATS_TEXTANALYSIS"))
+    shutil.copy(os.path.join(SRC, "lex.ZIP"), os.path.join(extdir, "STATS_TEXTANALYSIS"))
+
+def runchild(task, argv):
+    """Run task in a new process with an empty cache directory and return its measurements or an error message"""
+
+    with tempfile.TemporaryDirectory() as base:
+        extdir = os.path.join(base, "extensions")
+        os.mkdir(extdir)
+        install(extdir)
+        env = dict(os.environ, LOCALAPPDATA=os.path.join(base, "cache"))
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--task", task, "--extdir", extdir] + argv,
+            env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    for line in proc.stdout.splitlines():
+        if line.startswith("RESULT "):
+            return json.loads(line[7:])
+    lines = proc.stderr.strip().splitlines() or ["exit status {0}".format(proc.returncode)]
+    return lines[-1]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("tasks", nargs="*", metavar="task", help="tasks to run: " + ", ".join(TASKS))
+    parser.add_argument("--cases", type=int, default=10000, help="number of cases")
+    parser.add_argument("--words", type=int, default=15, help="mean number of words in an answer")
+    parser.add_argument("--lengths", choices=["fixed", "uniform", "exponential", "lognormal"], default="lognormal",
+        help="distribution of the answer lengths")
+    parser.add_argument("--duplicates", type=float, default=.2, help="fraction of answers repeating an earlier one")
+    parser.add_argument("--blanks", type=float, default=.1, help="fraction of blank answers")
+    parser.add_argument("--typos", type=float, default=.03, help="fraction of misspelled words")
+    parser.add_argument("--variables", type=int, default=1, help="number of text variables")
+    parser.add_argument("--repeat", type=int, default=1, help="runs of each task in the same process")
+    parser.add_argument("--seed", type=int, default=1, help="random number seed for the corpus")
+    parser.add_argument("--tokenizer", choices=["nltk", "regex"], default="nltk", help="TOKENIZER setting")
+    parser.add_argument("--stopwords", action="store_true",
+        help="remove English or German stopwords, which needs the nltk stopwords data")
+    parser.add_argument("--download", action="store_true", help="download any missing nltk data")
+    parser.add_argument("--task", help=argparse.SUPPRESS)
+    parser.add_argument("--extdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.repeat = max(1, args.repeat)
+    unknown = [task for task in args.tasks if task not in TASKS]
+    if unknown:
+        parser.error("unknown tasks: " + " ".join(unknown))
+
+    if args.task:
+        result = runtask(args.task, args)
+        print("RESULT " + json.dumps(result))
+        return
+
+    argv = [a for a in sys.argv[1:] if a not in TASKS]
+    cases = args.cases * args.variables
+    print("{0} cases, {1} variables, {2} mean words ({3}), {4:.0%} duplicates, {5:.0%} blanks, {6} tokenizer".format(
+        args.cases, args.variables, args.words, args.lengths, args.duplicates, args.blanks, args.tokenizer))
+    print("{0:<12} {1:>10} {2:>12} {3:>12} {4:<16} {5:>12} {6:>10} {7:>10}".format(
+        "Task", "First (s)", "Cases/sec", "Warm c/s", "Function", "Function c/s", "Peak MB", "Added MB"))
+    failed = False
+    for task in args.tasks or TASKS:
+        result = runchild(task, argv)
+        if isinstance(result, str):
+            print("{0:<12} failed: {1}".format(task, result))
+            failed = True
+            continue
+        warm = result["warm"] and "{0:12.0f}".format(cases / result["warm"]) or "{0:>12}".format("")
+        function = result["seconds"] and "{0:12.0f}".format(cases / result["seconds"]) or "{0:>12}".format("")
+        print("{0:<12} {1:10.2f} {2:12.0f} {3} {4:<16} {5} {6:10.1f} {7:10.1f}".format(
+            task, result["first"], cases / result["first"], warm, result["function"] or "", function,
+            result["peak"], result["added"]))
+    sys.exit(failed and 1 or 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Speed and agreement of the regular expression tokenizer with the nltk tokenizer
+
+TOKENIZER=REGEX replaces the nltk Punkt sentence tokenizer and Treebank word
+tokenizer with a single regular expression.  This tokenizes a sample of texts
+both ways and reports the cases per second of each and how closely the regular
+expression tokens agree with the nltk tokens: the percentage of cases with
+exactly the same tokens, with the same tokens in the same sentences, and the
+percentage of nltk tokens matched, counting each token as often as it occurs.
+Some of the cases that differ are listed.
+
+The texts are the synthetic survey answers of benchmark.py or the lines of a
+UTF-8 text file.  The nltk punkt data must be installed.
+
+Usage: python tools/tokenizer_benchmark.py [--file textfile] [--cases N] [--seed N] [--show N]
+"""
+
+import os, sys, argparse, time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import textaworker
+from benchmark import corpus
+
+def timed(tokenize, texts):
+    """Return the sentence token lists of each text and the seconds taken"""
+
+    start = time.perf_counter()
+    result = [tokenize(text) for text in texts]
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--file", help="text file with one case per line instead of the synthetic answers")
+    parser.add_argument("--cases", type=int, default=10000, help="number of synthetic cases")
+    parser.add_argument("--seed", type=int, default=1, help="random number seed for the synthetic cases")
+    parser.add_argument("--show", type=int, default=10, help="number of differing cases to list")
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            texts = [line.rstrip() for line in f]
+    else:
+        texts = corpus(args.cases, seed=args.seed)
+    texts = [text for text in texts if text]
+    if not texts:
+        sys.exit("There are no texts")
+
+    nltksents, nltktime = timed(textaworker.nltksentences, texts)
+    regexsents, regextime = timed(textaworker.regexsentences, texts)
+
+    sametokens = samesentences = matched = total = 0
+    differ = []
+    for text, a, b in zip(texts, nltksents, regexsents):
+        atokens = [w for s in a for w in s]
+        btokens = [w for s in b for w in s]
+        total += len(atokens)
+        matched += sum((Counter(atokens) & Counter(btokens)).values())
+        if atokens == btokens:
+            sametokens += 1
+            if a == b:
+                samesentences += 1
+                continue
+        differ.append((text, a, b))
+
+    n = len(texts)
+    print("{0} cases with text".format(n))
+    print("{0:<10} {1:>10} {2:>12}".format("Tokenizer", "Seconds", "Cases/sec"))
+    for name, seconds in [("nltk", nltktime), ("regex", regextime)]:
+        print("{0:<10} {1:10.2f} {2:12.0f}".format(name, seconds, n / seconds))
+    print("regex is {0:.1f} times as fast".format(nltktime / regextime))
+    print("Same tokens: {0:.1%} of cases".format(sametokens / n))
+    print("Same tokens and sentences: {0:.1%} of cases".format(samesentences / n))
+    print("nltk tokens matched: {0:.2%}".format(total and matched / total or 1))
+    for text, a, b in differ[:args.show]:
+        print("\n" + text)
+        print("  nltk:  {0}".format(a))
+        print("  regex: {0}".format(b))
+
+if __name__ == "__main__":
+    main()
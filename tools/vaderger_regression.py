@@ -0,0 +1,329 @@
+"""Regression check for the German VADER scoring kernel in vaderSentimentGER
+
+polarity_scores was rewritten as a single positional pass.  The scores must be
+identical to the original kernel whenever no token is repeated in a text
+(the original located each token with list.index, so repeated tokens were
+scored at the position of their first occurrence, and the 'but' adjustment
+located each score the same way, so repeated score values were adjusted at
+the wrong position).
+
+This compares the current kernel with a copy of the original on fixed
+sentences and on random texts built from the lexicon, including long
+answers, and exits with status 1 if any score differs.
+
+Usage: python tools/vaderger_regression.py [number of random texts] [seed]
+"""
+
+import os, sys, random, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import vaderSentimentGER as vader
+from vaderSentimentGER import (SentimentIntensityAnalyzer, negated, scalar_inc_dec,
+    BOOSTER_DICT, NEGATE, PUNC_LIST, REGEX_REMOVE_PUNCTUATION, SPECIAL_CASE_IDIOMS, C_INCR, N_SCALAR)
+from itertools import product
+
+SENTENCES = [
+    "Das ist ein sehr gutes Produkt, aber der Service war schlecht!",
+    "Ich bin nicht zufrieden mit der Lieferung.",
+    "Absolut fantastisch!!! Immer wieder gerne.",
+    "Die Beratung war kaum hilfreich und ziemlich teuer.",
+    "GROSSARTIG gemacht, danke",
+    "Nie wieder bestelle ich hier, total enttäuschend :(",
+    "Es war irgendwie okay, nichts Besonderes.",
+    "the service was good but the food was terrible",
+    "at least it was cheap",
+    "not the least bit helpful",
+    "kind of nice",
+    "without doubt the best",
+    "never so happy",
+    "Freundlich, kompetent und schnell ❤️",
+    "\"Super\" -- wirklich?! ,schade, (leider) ...gut... :-) :D !!toll ?!?prima!?!",
+    "",
+    "ok",
+]
+
+
+class SentiText(vader.SentiText):
+    """The tokenizer as it was before the single pass rewrite"""
+
+    def _words_plus_punc(self):
+        no_punc_text = REGEX_REMOVE_PUNCTUATION.sub('', self.text)
+        words_only = no_punc_text.split()
+        words_only = set(w for w in words_only if len(w) > 1)
+        punc_before = {''.join(p): p[1] for p in product(PUNC_LIST, words_only)}
+        punc_after = {''.join(p): p[0] for p in product(words_only, PUNC_LIST)}
+        words_punc_dict = punc_before
+        words_punc_dict.update(punc_after)
+        return words_punc_dict
+
+    def _words_and_emoticons(self):
+        wes = self.text.split()
+        words_punc_dict = self._words_plus_punc()
+        wes = [we for we in wes if len(we) > 1]
+        for i, we in enumerate(wes):
+            if we in words_punc_dict:
+                wes[i] = words_punc_dict[we]
+        return wes
+
+
+class ReferenceAnalyzer(SentimentIntensityAnalyzer):
+    """The scoring kernel as it was before the single pass rewrite"""
+
+    def __init__(self, lexicon, emojis):
+        self.lexicon = lexicon
+        self.emojis = emojis
+        self.duplicate = False
+
+    def polarity_scores(self, text):
+        """
+        Return a float for sentiment strength based on the input text.
+        Positive values are positive valence, negative value are negative
+        valence.
+        """
+        # convert emojis to their textual descriptions
+        text_token_list = text.split()
+        text_no_emoji_lst = []
+        for token in text_token_list:
+            if token in self.emojis:
+                # get the textual description
+                description = self.emojis[token]
+                text_no_emoji_lst.append(description)
+            else:
+                text_no_emoji_lst.append(token)
+        text = " ".join(x for x in text_no_emoji_lst)
+
+        sentitext = SentiText(text)
+
+        sentiments = []
+        words_and_emoticons = sentitext.words_and_emoticons
+        for item in words_and_emoticons:
+            valence = 0
+            i = words_and_emoticons.index(item)
+            # check for vader_lexicon words that may be used as modifiers or negations
+            if item.lower() in BOOSTER_DICT:
+                sentiments.append(valence)
+                continue
+            if (i < len(words_and_emoticons) - 1 and item.lower() == "kind" and
+                words_and_emoticons[i + 1].lower() == "of"):
+                sentiments.append(valence)
+                continue
+
+            sentiments = self.sentiment_valence(valence, sentitext, item, i, sentiments)
+
+        sentiments = self._but_check(words_and_emoticons, sentiments)
+
+        valence_dict = self.score_valence(sentiments, text)
+
+        return valence_dict
+
+    def sentiment_valence(self, valence, sentitext, item, i, sentiments):
+        is_cap_diff = sentitext.is_cap_diff
+        words_and_emoticons = sentitext.words_and_emoticons
+                # change
+        item_lowercase = item.lower()
+        item_lowercase = item
+                # change
+        if item_lowercase not in self.lexicon:
+            item_lowercase = item.lower()
+                        # change
+            if item_lowercase not in self.lexicon:
+                item_lowercase = item.capitalize()
+                # -------- Originale Fortsetzung
+        if item_lowercase in self.lexicon:
+            # get the sentiment valence
+            valence = self.lexicon[item_lowercase]
+            # check if sentiment laden word is in ALL CAPS (while others aren't)
+            if item.isupper() and is_cap_diff:
+                if valence > 0:
+                    valence += C_INCR
+                else:
+                    valence -= C_INCR
+
+            for start_i in range(0, 3):
+                # dampen the scalar modifier of preceding words and emoticons
+                # (excluding the ones that immediately preceed the item) based
+                # on their distance from the current item.
+                if i > start_i and words_and_emoticons[i - (start_i + 1)].lower() not in self.lexicon:
+                    s = scalar_inc_dec(words_and_emoticons[i - (start_i + 1)], valence, is_cap_diff)
+                    if start_i == 1 and s != 0:
+                        s = s * 0.95
+                    if start_i == 2 and s != 0:
+                        s = s * 0.9
+                    valence = valence + s
+                    valence = self._negation_check(valence, words_and_emoticons, start_i, i)
+                    if start_i == 2:
+                        valence = self._special_idioms_check(valence, words_and_emoticons, i)
+
+            valence = self._least_check(valence, words_and_emoticons, i)
+        sentiments.append(valence)
+        return sentiments
+
+    def _least_check(self, valence, words_and_emoticons, i):
+        # check for negation case using "least"
+        if i > 1 and words_and_emoticons[i - 1].lower() not in self.lexicon \
+           and words_and_emoticons[i - 1].lower() == "least":
+            if words_and_emoticons[i - 2].lower() != "at" and words_and_emoticons[i - 2].lower() != "very":
+                valence = valence * N_SCALAR
+        elif i > 0 and words_and_emoticons[i - 1].lower() not in self.lexicon \
+             and words_and_emoticons[i - 1].lower() == "least":
+            valence = valence * N_SCALAR
+        return valence
+
+    def _but_check(self, words_and_emoticons, sentiments):
+        # check for modification in sentiment due to contrastive conjunction 'but'
+        words_and_emoticons_lower = [str(w).lower() for w in words_and_emoticons]
+        if 'but' in words_and_emoticons_lower:
+            bi = words_and_emoticons_lower.index('but')
+            for position, sentiment in enumerate(sentiments):
+                si = sentiments.index(sentiment)
+                # a repeated nonzero value is found at the wrong position
+                if si != position and sentiment != 0:
+                    self.duplicate = True
+                if si < bi:
+                    sentiments.pop(si)
+                    sentiments.insert(si, sentiment * 0.5)
+                elif si > bi:
+                    sentiments.pop(si)
+                    sentiments.insert(si, sentiment * 1.5)
+        return sentiments
+
+    @staticmethod
+    def _special_idioms_check(valence, words_and_emoticons, i):
+        words_and_emoticons_lower = [str(w).lower() for w in words_and_emoticons]
+        onezero = "{0} {1}".format(words_and_emoticons_lower[i - 1], words_and_emoticons_lower[i])
+
+        twoonezero = "{0} {1} {2}".format(words_and_emoticons_lower[i - 2],
+                                          words_and_emoticons_lower[i - 1], words_and_emoticons_lower[i])
+
+        twoone = "{0} {1}".format(words_and_emoticons_lower[i - 2], words_and_emoticons_lower[i - 1])
+
+        threetwoone = "{0} {1} {2}".format(words_and_emoticons_lower[i - 3],
+                                           words_and_emoticons_lower[i - 2], words_and_emoticons_lower[i - 1])
+
+        threetwo = "{0} {1}".format(words_and_emoticons_lower[i - 3], words_and_emoticons_lower[i - 2])
+
+        sequences = [onezero, twoonezero, twoone, threetwoone, threetwo]
+
+        for seq in sequences:
+            if seq in SPECIAL_CASE_IDIOMS:
+                valence = SPECIAL_CASE_IDIOMS[seq]
+                break
+
+        if len(words_and_emoticons_lower) - 1 > i:
+            zeroone = "{0} {1}".format(words_and_emoticons_lower[i], words_and_emoticons_lower[i + 1])
+            if zeroone in SPECIAL_CASE_IDIOMS:
+                valence = SPECIAL_CASE_IDIOMS[zeroone]
+        if len(words_and_emoticons_lower) - 1 > i + 1:
+            zeroonetwo = "{0} {1} {2}".format(words_and_emoticons_lower[i], words_and_emoticons_lower[i + 1],
+                                              words_and_emoticons_lower[i + 2])
+            if zeroonetwo in SPECIAL_CASE_IDIOMS:
+                valence = SPECIAL_CASE_IDIOMS[zeroonetwo]
+
+        # check for booster/dampener bi-grams such as 'sort of' or 'kind of'
+        n_grams = [threetwoone, threetwo, twoone]
+        for n_gram in n_grams:
+            if n_gram in BOOSTER_DICT:
+                valence = valence + BOOSTER_DICT[n_gram]
+        return valence
+
+    @staticmethod
+    def _negation_check(valence, words_and_emoticons, start_i, i):
+        words_and_emoticons_lower = [str(w).lower() for w in words_and_emoticons]
+        if start_i == 0:
+            if negated([words_and_emoticons_lower[i - (start_i + 1)]]):  # 1 word preceding lexicon word (w/o stopwords)
+                valence = valence * N_SCALAR
+        if start_i == 1:
+            if words_and_emoticons_lower[i - 2] == "never" and \
+               (words_and_emoticons_lower[i - 1] == "so" or
+                     words_and_emoticons_lower[i - 1] == "this"):
+                valence = valence * 1.25
+            elif words_and_emoticons_lower[i - 2] == "without" and \
+                 words_and_emoticons_lower[i - 1] == "doubt":
+                valence = valence
+            elif negated([words_and_emoticons_lower[i - (start_i + 1)]]):  # 2 words preceding the lexicon word position
+                valence = valence * N_SCALAR
+        if start_i == 2:
+            if words_and_emoticons_lower[i - 3] == "never" and \
+               (words_and_emoticons_lower[i - 2] == "so" or words_and_emoticons_lower[i - 2] == "this") or \
+                    (words_and_emoticons_lower[i - 1] == "so" or words_and_emoticons_lower[i - 1] == "this"):
+                valence = valence * 1.25
+            elif words_and_emoticons_lower[i - 3] == "without" and \
+                 (words_and_emoticons_lower[i - 2] == "doubt" or words_and_emoticons_lower[i - 1] == "doubt"):
+                valence = valence
+            elif negated([words_and_emoticons_lower[i - (start_i + 1)]]):  # 3 words preceding the lexicon word position
+                valence = valence * N_SCALAR
+        return valence
+
+
+def lexicons():
+    """Return the lexicon and emoji dictionaries parsed from lex.ZIP without the compiled cache"""
+
+    src = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "lex.ZIP")
+    return vader.loadlexicons(src, "GERVaderLexicon.txt", "emoji_utf8_lexicon.txt")
+
+
+def randomtexts(lexicon, emojis, count, seed):
+    """Return count random texts built from lexicon words and modifiers"""
+
+    rng = random.Random(seed)
+    words = sorted(lexicon)
+    modifiers = sorted(BOOSTER_DICT) + list(NEGATE) + ["least", "at", "very", "kind", "of",
+        "but", "never", "so", "this", "without", "doubt"] + sorted(emojis)[:50]
+    fillers = ["und", "der", "die", "das", "ist", "war", "ich", "wir", "es", "mit", "zu", "Haus",
+        "Kunde", "Preis", "Lieferung"]
+    texts = []
+    for k in range(count):
+        # mostly survey-length answers plus some long ones
+        length = rng.choice([3, 5, 8, 12, 20, 40]) if k % 10 else rng.choice([200, 500, 800])
+        pool = rng.sample(words, min(length, len(words))) + rng.sample(modifiers, 10) + fillers
+        tokens = rng.sample(pool, min(length, len(pool)))
+        tokens = [t.upper() if rng.random() < 0.05 else t for t in tokens]
+        tokens = [t + rng.choice(["", "", "", ",", "!", "?", "."]) for t in tokens]
+        texts.append(" ".join(tokens))
+    return texts
+
+
+def nodups(analyzer, text):
+    """Return True if no token of the scored text is repeated"""
+
+    text = " ".join(analyzer.emojis.get(token, token) for token in text.split())
+    tokens = SentiText(text).words_and_emoticons
+    return len(set(tokens)) == len(tokens)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 20261018
+    lexicon, emojis = lexicons()
+    current = SentimentIntensityAnalyzer.__new__(SentimentIntensityAnalyzer)
+    current.lexicon, current.emojis = lexicon, emojis
+    current._folded, current._foldedsize = None, -1
+    reference = ReferenceAnalyzer(lexicon, emojis)
+
+    texts = [t for t in SENTENCES + randomtexts(lexicon, emojis, count, seed) if nodups(reference, t)]
+    failures = skipped = 0
+    reftime = curtime = 0.
+    for text in texts:
+        reference.duplicate = False
+        t0 = time.perf_counter()
+        expected = reference.polarity_scores(text)
+        t1 = time.perf_counter()
+        got = current.polarity_scores(text)
+        t2 = time.perf_counter()
+        reftime += t1 - t0
+        curtime += t2 - t1
+        if reference.duplicate:
+            skipped += 1
+            continue
+        if got != expected:
+            failures += 1
+            if failures <= 10:
+                print("MISMATCH {0}\n  expected {1}\n  got      {2}".format(text[:200], expected, got))
+    print("texts compared: {0}, mismatches: {1}".format(len(texts) - skipped, failures))
+    print("texts skipped for repeated scores around 'but': {0}".format(skipped))
+    print("seconds original: {0:.3f}, current: {1:.3f}".format(reftime, curtime))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())